@@ -1,15 +1,31 @@
 from django import forms
 from django.contrib import admin
 from django.http import JsonResponse
-from django.urls import path
+from django.db.models import Count, Max, Q, Sum
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from import_export import fields, resources
+from import_export.resources import modelresource_factory
 from import_export.admin import ImportExportModelAdmin
 from import_export.formats import base_formats
 from import_export.widgets import ForeignKeyWidget
 from simple_history.admin import SimpleHistoryAdmin
 
-from .models import Appointment, Category, Client, Employee, Product, Review, Service
+from .availability import describe_conflict, find_conflicts
+from .booking import bulk_set_status
+from .cache_utils import deferred_invalidation
+from .models import (
+    Appointment,
+    Category,
+    Client,
+    Employee,
+    Product,
+    ReminderLog,
+    Review,
+    Service,
+)
 
 
 class AppointmentForm(forms.ModelForm):
@@ -39,9 +55,50 @@ class AppointmentForm(forms.ModelForm):
             except (ValueError, TypeError):
                 pass
 
+    def clean(self):
+        cleaned_data = super().clean()
+        employee = cleaned_data.get("employee")
+        service = cleaned_data.get("service")
+        date = cleaned_data.get("date")
+        time = cleaned_data.get("time")
+        if (
+            employee
+            and service
+            and date
+            and time
+            and cleaned_data.get("status") != "canceled"
+        ):
+            conflicts = find_conflicts(
+                employee.pk, date, time, service, exclude_pk=self.instance.pk
+            )
+            if conflicts:
+                raise forms.ValidationError(describe_conflict(conflicts))
+        return cleaned_data
+
+
+class CacheAwareResource(resources.ModelResource):
+    """
+    Импорт без пакетного режима сохраняет строки по одной, и post_save
+    каждой строки сбрасывал бы кеш отдельно. Сбросы копятся и выполняются
+    один раз на весь импорт.
+    """
+
+    def import_data(self, *args, **kwargs):
+        with deferred_invalidation():
+            return super().import_data(*args, **kwargs)
+
+
+class CacheAwareImportExportAdmin(ImportExportModelAdmin):
+    """ImportExportModelAdmin, чей ресурс по умолчанию — CacheAwareResource."""
+
+    def get_resource_classes(self, request):
+        if not self.resource_classes and not self.resource_class:
+            return [modelresource_factory(self.model, CacheAwareResource)]
+        return super().get_resource_classes(request)
+
 
 # Ресурс для экспорта записей
-class AppointmentResource(resources.ModelResource):
+class AppointmentResource(CacheAwareResource):
     client_name = fields.Field(attribute="client__name", column_name="Клиент")
     service_name = fields.Field(attribute="service__name", column_name="Услуга")
     status_display = fields.Field(
@@ -67,7 +124,7 @@ class AppointmentResource(resources.ModelResource):
 
 
 @admin.register(Appointment)
-class AppointmentAdmin(SimpleHistoryAdmin, ImportExportModelAdmin):
+class AppointmentAdmin(SimpleHistoryAdmin, CacheAwareImportExportAdmin):
     resource_class = AppointmentResource
     form = AppointmentForm
     list_display = ("client", "employee", "date", "time", "status")
@@ -79,9 +136,30 @@ class AppointmentAdmin(SimpleHistoryAdmin, ImportExportModelAdmin):
     list_display_links = ("client", "employee")
     formats = [base_formats.XLS, base_formats.XLSX, base_formats.CSV]
 
+    actions = ("mark_confirmed", "mark_completed", "mark_canceled")
+
     class Media:
         js = ("js/admin_appointment.js",)
 
+    def set_status(self, request, queryset, new_status):
+        updated = bulk_set_status(queryset, new_status, user=request.user)
+        self.message_user(request, f"Обновлено записей: {updated}")
+
+    def mark_confirmed(self, request, queryset):
+        self.set_status(request, queryset, "confirmed")
+
+    mark_confirmed.short_description = "Подтвердить выбранные записи"
+
+    def mark_completed(self, request, queryset):
+        self.set_status(request, queryset, "completed")
+
+    mark_completed.short_description = "Отметить выбранные записи выполненными"
+
+    def mark_canceled(self, request, queryset):
+        self.set_status(request, queryset, "canceled")
+
+    mark_canceled.short_description = "Отменить выбранные записи"
+
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
@@ -99,26 +177,99 @@ class AppointmentAdmin(SimpleHistoryAdmin, ImportExportModelAdmin):
         return JsonResponse(list(employees), safe=False)
 
 
+# Сколько дней истории показывать в карточке клиента
+RECENT_APPOINTMENTS_DAYS = 90
+
+
 class AppointmentInline(admin.TabularInline):
+    """
+    Недавние записи клиента только для просмотра: связанные объекты берутся
+    из select_related, а не отдельным запросом на каждый виджет. Изменения —
+    через карточку записи (там же проверка пересечений), полная история —
+    по ссылке в карточке клиента.
+    """
+
     model = Appointment
     extra = 0
-    readonly_fields = ("created_at",)
+    fields = ("date", "time", "employee", "service", "status", "created_at")
+    readonly_fields = fields
+    show_change_link = True
+    verbose_name_plural = f"Записи за последние {RECENT_APPOINTMENTS_DAYS} дней"
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        since = timezone.localdate() - timezone.timedelta(days=RECENT_APPOINTMENTS_DAYS)
+        return (
+            super()
+            .get_queryset(request)
+            .filter(date__gte=since)
+            .select_related("employee", "service")
+        )
 
 
 @admin.register(Client)
-class ClientAdmin(ImportExportModelAdmin):
-    list_display = ("name", "email", "phone", "appointment_count")
+class ClientAdmin(CacheAwareImportExportAdmin):
+    list_display = (
+        "name",
+        "email",
+        "phone",
+        "appointment_count",
+        "last_visit",
+        "total_spent",
+    )
     search_fields = ("name", "email")
+    readonly_fields = ("all_appointments",)
     inlines = [AppointmentInline]
 
+    def get_queryset(self, request):
+        # Счётчики для всех строк списка — одним агрегирующим запросом
+        completed = Q(appointment__status="completed")
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                appointment_total=Count("appointment"),
+                last_visit_date=Max("appointment__date", filter=completed),
+                total_spent_sum=Sum("appointment__service__price", filter=completed),
+            )
+        )
+
     def appointment_count(self, obj):
-        return obj.appointment_set.count()
+        return obj.appointment_total
 
     appointment_count.short_description = "Кол-во записей"
+    appointment_count.admin_order_field = "appointment_total"
+
+    def last_visit(self, obj):
+        return obj.last_visit_date
+
+    last_visit.short_description = "Последний визит"
+    last_visit.admin_order_field = "last_visit_date"
+
+    def total_spent(self, obj):
+        return obj.total_spent_sum or 0
+
+    total_spent.short_description = "Сумма визитов, ₽"
+    total_spent.admin_order_field = "total_spent_sum"
+
+    def all_appointments(self, obj):
+        if obj.pk is None:
+            return "-"
+        url = reverse("admin:beauty_salon_appointment_changelist")
+        return format_html(
+            '<a href="{}?client__id__exact={}">Все записи клиента ({})</a>',
+            url,
+            obj.pk,
+            obj.appointment_total,
+        )
+
+    all_appointments.short_description = "История записей"
 
 
 @admin.register(Employee)
-class EmployeeAdmin(ImportExportModelAdmin):
+class EmployeeAdmin(CacheAwareImportExportAdmin):
     list_display = ("id", "name", "position")
     filter_horizontal = ("services",)
     search_fields = ("name",)
@@ -146,14 +297,14 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Service)
-class ServiceAdmin(ImportExportModelAdmin):
-    list_display = ("name", "category", "price")
+class ServiceAdmin(CacheAwareImportExportAdmin):
+    list_display = ("name", "category", "price", "duration")
     list_filter = ("category", "price")
     search_fields = ("name", "description")
 
 
 @admin.register(Product)
-class ProductAdmin(ImportExportModelAdmin):
+class ProductAdmin(CacheAwareImportExportAdmin):
     list_display = ("name", "price")
     search_fields = ("name",)
 
@@ -193,3 +344,24 @@ class ReviewAdmin(admin.ModelAdmin):
         return "⭐" * obj.rating
 
     rating_display.short_description = "Рейтинг"
+
+
+@admin.register(ReminderLog)
+class ReminderLogAdmin(admin.ModelAdmin):
+    list_display = ("appointment", "date", "time", "kind", "status", "sent_at")
+    list_filter = ("status", "kind", "channel")
+    list_select_related = ("appointment__client",)
+    date_hierarchy = "sent_at"
+    readonly_fields = (
+        "appointment",
+        "date",
+        "time",
+        "channel",
+        "kind",
+        "status",
+        "sent_at",
+    )
+
+    def has_add_permission(self, request):
+        # Журнал ведёт рассылка, вручную строки не создаются
+        return False
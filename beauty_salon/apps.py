@@ -5,3 +5,8 @@ class BeautySalonConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "beauty_salon"
     verbose_name = "Салон красоты"
+
+    def ready(self):
+        from .signals import connect_cache_invalidation
+
+        connect_cache_invalidation()
@@ -0,0 +1,190 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache_utils import EMPLOYEES_NAMESPACE, SERVICES_NAMESPACE, get_cached_data
+from .models import Appointment, Employee, Service
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def describe_conflict(conflicts):
+    start, end = conflicts[0]
+    return f"Мастер занят с {format_minutes(start)} до {format_minutes(end)}."
+
+
+def get_span(start, duration, buffer):
+    """Интервал [начало, конец) в минутах, который запись занимает у мастера."""
+    start = to_minutes(start)
+    return start, start + duration + buffer
+
+
+class BusyIndex:
+    """
+    Занятые интервалы мастеров по дням.
+
+    Для каждой пары (мастер, день) хранятся отсортированные массивы начал и
+    концов непересекающихся интервалов (в минутах от полуночи), поэтому
+    проверка слота — один бинарный поиск.
+    """
+
+    def __init__(self):
+        self._raw = defaultdict(list)
+        self._days = {}
+
+    def add(self, employee_id, day, start, end):
+        self._raw[(employee_id, day)].append((start, end))
+        self._days.pop((employee_id, day), None)
+
+    def _get_day(self, employee_id, day):
+        key = (employee_id, day)
+        if key not in self._days:
+            starts, ends = [], []
+            for start, end in sorted(self._raw.get(key, ())):
+                if ends and start <= ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self._days[key] = (starts, ends)
+        return self._days[key]
+
+    def is_free(self, employee_id, day, start, end):
+        starts, ends = self._get_day(employee_id, day)
+        # Пересечься может только последний интервал, начавшийся до end
+        index = bisect_left(starts, end)
+        return index == 0 or ends[index - 1] <= start
+
+
+def get_service_employees(service_id):
+    """[(id, name)] мастеров услуги — из кеша каталога."""
+    return get_cached_data(
+        f"service_employees_{service_id}",
+        lambda: list(
+            Employee.objects.filter(services=service_id)
+            .order_by("id")
+            .values_list("id", "name")
+        ),
+        settings.CATALOG_CACHE_TTL,
+        namespace=EMPLOYEES_NAMESPACE,
+    )
+
+
+def get_service_timing(service_id):
+    """(длительность, перерыв) услуги или None — из кеша каталога."""
+    return get_cached_data(
+        f"service_timing_{service_id}",
+        lambda: Service.objects.filter(pk=service_id)
+        .values_list("duration", "buffer")
+        .first(),
+        settings.CATALOG_CACHE_TTL,
+        namespace=SERVICES_NAMESPACE,
+    )
+
+
+def build_busy_index(employee_ids, date_from, date_to):
+    """Все занятые интервалы за период — одним запросом к БД."""
+    index = BusyIndex()
+    rows = (
+        Appointment.objects.filter(
+            employee_id__in=employee_ids, date__range=(date_from, date_to)
+        )
+        .exclude(status="canceled")
+        .values_list(
+            "employee_id", "date", "time", "service__duration", "service__buffer"
+        )
+    )
+    for employee_id, day, start, duration, buffer in rows:
+        index.add(employee_id, day, *get_span(start, duration, buffer))
+    return index
+
+
+def find_conflicts(employee_id, day, start, service, exclude_pk=None):
+    """
+    Записи мастера, пересекающиеся с новой записью на услугу service.
+
+    Один диапазонный запрос по индексу (employee, date, time): кандидаты —
+    записи того же дня, начавшиеся до конца нового интервала; их концы
+    проверяются уже в памяти. Возвращает [(начало, конец)] в минутах.
+    """
+    begin, end = get_span(start, service.duration, service.buffer)
+    queryset = Appointment.objects.filter(employee_id=employee_id, date=day)
+    if end < 24 * 60:
+        queryset = queryset.filter(time__lt=time(end // 60, end % 60))
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    rows = (
+        queryset.exclude(status="canceled")
+        .order_by()
+        .values_list("time", "service__duration", "service__buffer")
+    )
+    conflicts = []
+    for other_start, duration, buffer in rows:
+        span = get_span(other_start, duration, buffer)
+        if span[1] > begin:
+            conflicts.append(span)
+    return sorted(conflicts)
+
+
+def get_available_slots(service_id, date_from, date_to, employee_id=None):
+    """
+    Свободные времена начала услуги у мастеров за период.
+
+    Возвращает список {"employee", "employee_name", "date", "slots"}.
+    """
+    timing = get_service_timing(service_id)
+    employees = get_service_employees(service_id)
+    if employee_id is not None:
+        employees = [item for item in employees if item[0] == employee_id]
+    if timing is None or not employees:
+        return []
+
+    from .holds import get_held_spans
+
+    employee_ids = [item[0] for item in employees]
+    index = build_busy_index(employee_ids, date_from, date_to)
+    # Временно забронированные слоты тоже не показываем
+    for (pk, day), spans in get_held_spans(employee_ids, date_from, date_to).items():
+        for span in spans:
+            index.add(pk, day, *span)
+    duration, buffer = timing
+    step = settings.APPOINTMENT_SLOT_MINUTES
+    opening = to_minutes(settings.SALON_OPENING_TIME)
+    closing = to_minutes(settings.SALON_CLOSING_TIME)
+
+    now = timezone.localtime()
+    result = []
+    day = date_from
+    while day <= date_to:
+        first = opening
+        if day == now.date():
+            # Ближайший шаг сетки после текущего времени
+            elapsed = to_minutes(now) - opening
+            first = opening + max(0, (elapsed // step + 1) * step)
+        elif day < now.date():
+            first = closing
+        for pk, name in employees:
+            slots = [
+                format_minutes(start)
+                for start in range(first, closing - duration + 1, step)
+                if index.is_free(pk, day, start, start + duration + buffer)
+            ]
+            result.append(
+                {
+                    "employee": pk,
+                    "employee_name": name,
+                    "date": day.isoformat(),
+                    "slots": slots,
+                }
+            )
+        day += timedelta(days=1)
+    return result
@@ -0,0 +1,147 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from simple_history.utils import bulk_update_with_history
+
+from .availability import describe_conflict, find_conflicts
+from .cache_utils import (
+    APPOINTMENTS_STAFF_TAG,
+    REVIEWS_NAMESPACE,
+    appointment_user_tag,
+    invalidate_namespaces,
+)
+from .models import Appointment, EmployeeDayLock, Review
+
+RETRY_DELAY = 0.05
+# Сколько записей обновляется одним запросом при массовой смене статуса
+BULK_STATUS_BATCH_SIZE = 500
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Это время уже занято."
+    default_code = "booking_conflict"
+
+
+def _acquire(lock_id):
+    if connection.features.has_select_for_update_nowait:
+        EmployeeDayLock.objects.select_for_update(nowait=True).get(pk=lock_id)
+    else:
+        # SQLite: запись в строку держит блокировку БД до конца транзакции
+        EmployeeDayLock.objects.filter(pk=lock_id).update(locked_at=timezone.now())
+
+
+def lock_employee_day(lock):
+    """
+    Блокирует день мастера до конца текущей транзакции.
+
+    Ожидание ограничено BOOKING_LOCK_WAIT: попытки без ожидания (NOWAIT)
+    повторяются с небольшой случайной паузой, после чего — BookingConflict.
+    """
+    deadline = time.monotonic() + settings.BOOKING_LOCK_WAIT
+    while True:
+        try:
+            with transaction.atomic():
+                _acquire(lock.pk)
+            return
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise BookingConflict(
+                    "Расписание мастера сейчас изменяется, попробуйте ещё раз."
+                )
+            time.sleep(RETRY_DELAY * (1 + random.random()))
+
+
+def reserve(employee_id, day, start, service, write, exclude_pk=None, user_id=None):
+    """
+    Выполняет write() в одной транзакции с проверкой пересечений, пока
+    день мастера заблокирован. Занятый интервал — BookingConflict (409),
+    чужая временная бронь (кроме броней user_id) — HoldConflict.
+    """
+    from .holds import HoldConflict, find_hold_conflicts
+
+    # Строка создаётся до транзакции бронирования: иначе конкурирующая
+    # вставка той же строки ждала бы её завершения без ограничения
+    lock, _ = EmployeeDayLock.objects.get_or_create(employee_id=employee_id, date=day)
+    with transaction.atomic():
+        lock_employee_day(lock)
+        conflicts = find_conflicts(employee_id, day, start, service, exclude_pk)
+        if conflicts:
+            raise BookingConflict(describe_conflict(conflicts))
+        # Бронь могли поставить после проверки в форме или сериализаторе
+        held = find_hold_conflicts(employee_id, day, start, service, user_id)
+        if held:
+            raise HoldConflict(describe_conflict(held))
+        return write()
+
+
+def save_booked(appointment, user_id=None):
+    """
+    Сохраняет запись из формы сайта под блокировкой дня мастера;
+    брони пользователя user_id ей не мешают.
+    """
+
+    def write():
+        appointment.save()
+        return appointment
+
+    if appointment.employee_id is None or appointment.status == "canceled":
+        return write()
+    return reserve(
+        appointment.employee_id,
+        appointment.date,
+        appointment.time,
+        appointment.service,
+        write,
+        exclude_pk=appointment.pk,
+        user_id=user_id,
+    )
+
+
+def bulk_set_status(queryset, new_status, user=None):
+    """
+    Меняет статус записей queryset на new_status одним bulk_update и пишет
+    их историю одним пакетным INSERT (вместо UPDATE и INSERT на каждую
+    запись).
+
+    Сигналы post_save при этом не отправляются, поэтому кеш сбрасывается
+    здесь: у персонала, у владельцев записей и, если к записям есть
+    отзывы, — у отзывов. Отменённые записи не восстанавливаются: время
+    могли уже занять, а проверку пересечений этот путь не выполняет.
+    Возвращает число изменённых записей.
+    """
+    appointments = list(
+        queryset.exclude(status=new_status)
+        .exclude(status="canceled")
+        .select_related("client")
+        .order_by()
+    )
+    if not appointments:
+        return 0
+    for appointment in appointments:
+        appointment.status = new_status
+    with transaction.atomic():
+        bulk_update_with_history(
+            appointments,
+            Appointment,
+            ["status"],
+            batch_size=BULK_STATUS_BATCH_SIZE,
+            default_user=user,
+            default_change_reason="Массовая смена статуса",
+        )
+
+    ids = [appointment.pk for appointment in appointments]
+    namespaces = {APPOINTMENTS_STAFF_TAG}
+    namespaces.update(
+        appointment_user_tag(user_id)
+        for user_id in {appointment.client.user_id for appointment in appointments}
+    )
+    if Review.objects.filter(appointment_id__in=ids).exists():
+        namespaces.add(REVIEWS_NAMESPACE)
+    invalidate_namespaces(namespaces)
+    return len(appointments)
@@ -1,23 +1,317 @@
-from django.core.cache import cache
+from contextlib import contextmanager
+from functools import partial
 import logging
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import local_cache
 
 logger = logging.getLogger(__name__)
 
+# Пространства имён кеша. Каждое имеет счётчик поколения, который входит
+# во все ключи пространства: инвалидация = инкремент одного числа.
+CATEGORIES_NAMESPACE = "categories"
+SERVICES_NAMESPACE = "services"
+EMPLOYEES_NAMESPACE = "employees"
+PRODUCTS_NAMESPACE = "products"
+APPOINTMENTS_NAMESPACE = "appointments"
+REVIEWS_NAMESPACE = "reviews"
+
+# Каталог меняется несколько раз в день — его читаем из памяти процесса
+LOCAL_NAMESPACES = {
+    CATEGORIES_NAMESPACE,
+    SERVICES_NAMESPACE,
+    EMPLOYEES_NAMESPACE,
+    PRODUCTS_NAMESPACE,
+}
+
+# Ключи кеша каталога
+CATEGORIES_CACHE_KEY = "categories_all"
+SERVICES_CACHE_KEY = "services_all"
+EMPLOYEES_CACHE_KEY = "employees_all"
+PRODUCTS_CACHE_KEY = "products_all"
+
+GENERATION_KEY_PREFIX = "gen"
+MTIME_KEY_PREFIX = "mtime"
+# Ключи поколений можно отпускать по TTL: после вытеснения счётчик
+# стартует с текущего времени и не совпадёт с ранее выданными значениями
+GENERATION_TIMEOUT = 60 * 60 * 24 * 30
+
+# Теги кеша представлений: записи клиента и сводка для персонала
+APPOINTMENTS_STAFF_TAG = f"{APPOINTMENTS_NAMESPACE}:staff"
+
+# Защита от "stampede": блокировка на пересчёт ключа, сколько ждать
+# чужого пересчёта и сколько отдавать устаревшее значение после TTL
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+LOCK_POLL_INTERVAL = 0.05
+STALE_TIMEOUT = 60 * 5
+# Коэффициент досрочного пересчёта (XFetch): > 1 — пересчитывать раньше
+EARLY_RECOMPUTE_BETA = 1.0
+
+STATS_KEY_PREFIX = "stats"
+
+# Реестр зависимостей: модель -> пространства имён, построенные на её данных
+_dependencies = {}
+_deferred = threading.local()
+
+
+def _generation_key(namespace):
+    return f"{GENERATION_KEY_PREFIX}:{namespace}"
+
+
+def _initial_generation():
+    return int(time.time() * 1000)
+
+
+def get_generations(namespaces):
+    """
+    Возвращает {namespace: поколение} не более чем за один запрос к кешу.
+    Поколения каталога берутся из памяти процесса (см. local_cache).
+    """
+    result = {}
+    epochs = {}
+    for namespace in namespaces:
+        if namespace in LOCAL_NAMESPACES:
+            local_cache.ensure_subscriber()
+            generation, epochs[namespace] = local_cache.get_generation(namespace)
+            if generation is not None:
+                result[namespace] = generation
+
+    keys = {
+        _generation_key(namespace): namespace
+        for namespace in namespaces
+        if namespace not in result
+    }
+    if keys:
+        values = cache.get_many(list(keys))
+        for key, namespace in keys.items():
+            if key not in values:
+                cache.add(key, _initial_generation(), GENERATION_TIMEOUT)
+                values[key] = cache.get(key)
+            result[namespace] = values[key]
+            if namespace in epochs:
+                local_cache.remember_generation(
+                    namespace, values[key], epochs[namespace]
+                )
+    return result
+
+
+def make_tagged_key(namespace, key, tags=()):
+    """
+    Ключ, зависящий от поколения пространства имён и поколений тегов:
+    инкремент любого из них делает запись недоступной.
+    """
+    generations = get_generations([namespace, *tags])
+    version = ".".join(str(generations[name]) for name in (namespace, *tags))
+    return f"{namespace}:v{version}:{key}"
+
+
+def appointment_user_tag(user_id):
+    return f"{APPOINTMENTS_NAMESPACE}:user:{user_id}"
+
+
+def _mtime_key(namespace, generation):
+    return f"{MTIME_KEY_PREFIX}:{namespace}:{generation}"
+
+
+def get_last_modified(generations):
+    """
+    Время последнего изменения (timestamp) по набору поколений.
+    Время привязано к поколению и не меняется, поэтому для каталога
+    оно тоже читается из памяти процесса.
+    """
+    result = {}
+    keys = {}
+    for namespace, generation in generations.items():
+        key = _mtime_key(namespace, generation)
+        value = None
+        if namespace in LOCAL_NAMESPACES:
+            value = local_cache.values.get(key)
+        if value is None:
+            keys[key] = namespace
+        else:
+            result[key] = value
+
+    if keys:
+        values = cache.get_many(list(keys))
+        for key, namespace in keys.items():
+            if key not in values:
+                # Изменений с момента, как мы начали следить, не было
+                cache.add(key, time.time(), GENERATION_TIMEOUT)
+                values[key] = cache.get(key) or time.time()
+            result[key] = values[key]
+            if namespace in LOCAL_NAMESPACES:
+                local_cache.values.set(key, values[key], settings.LOCAL_CACHE_TIMEOUT)
+    return max(result.values(), default=None)
+
+
+def bump_namespace(namespace):
+    """Инвалидирует все ключи пространства имён за O(1), без сканирования."""
+    key = _generation_key(namespace)
+    try:
+        generation = cache.incr(key)
+    except ValueError:
+        generation = _initial_generation()
+        cache.set(key, generation, GENERATION_TIMEOUT)
+    cache.set(_mtime_key(namespace, generation), time.time(), GENERATION_TIMEOUT)
+    if namespace in LOCAL_NAMESPACES:
+        local_cache.publish_invalidation(namespace)
+    logger.info(f"Cache namespace {namespace} bumped to generation {generation}")
+    return generation
+
+
+def increment_counter(name):
+    key = f"{STATS_KEY_PREFIX}:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_counters(names):
+    keys = {f"{STATS_KEY_PREFIX}:{name}": name for name in names}
+    values = cache.get_many(list(keys))
+    return {name: values.get(key, 0) for key, name in keys.items()}
+
+
+def _compute_and_store(cache_key, compute, timeout, stale_timeout):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    entry = (value, time.time() + timeout, delta)
+    cache.set(cache_key, entry, timeout + stale_timeout)
+    return value
+
+
+def fetch(
+    cache_key,
+    compute,
+    timeout,
+    stale_timeout=STALE_TIMEOUT,
+    beta=EARLY_RECOMPUTE_BETA,
+):
+    """
+    Читает значение из кеша, пересчитывая его не более чем в одном процессе.
+
+    Значение хранится как (value, soft_expires, delta) с жёстким TTL
+    timeout + stale_timeout. После soft_expires один процесс под
+    блокировкой пересчитывает значение, остальные получают устаревшее.
+    Незадолго до soft_expires пересчёт запускается досрочно с вероятностью,
+    зависящей от времени прошлого пересчёта (delta). При полном промахе
+    остальные процессы ждут пересчёт до LOCK_WAIT секунд.
+    """
+    lock_key = f"lock:{cache_key}"
+    entry = cache.get(cache_key)
+
+    if entry is not None:
+        value, expires, delta = entry
+        early = delta * beta * -math.log(1.0 - random.random())
+        if time.time() + early < expires:
+            logger.info(f"Cache HIT for key: {cache_key}")
+            return value
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            logger.info(f"Cache STALE for key: {cache_key}")
+            increment_counter("coalesced")
+            return value
+        try:
+            logger.info(f"Cache REFRESH for key: {cache_key}")
+            increment_counter("refreshed")
+            return _compute_and_store(cache_key, compute, timeout, stale_timeout)
+        finally:
+            cache.delete(lock_key)
+
+    logger.info(f"Cache MISS for key: {cache_key}")
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _compute_and_store(cache_key, compute, timeout, stale_timeout)
+        finally:
+            cache.delete(lock_key)
+
+    # Значение уже считает другой процесс — ждём его результат
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            increment_counter("coalesced")
+            return entry[0]
+    increment_counter("lock_timeouts")
+    return _compute_and_store(cache_key, compute, timeout, stale_timeout)
+
 
 # Утилита для получения данных из кеша или выполнения запроса к БД
-def get_cached_data(cache_key, queryset_func, timeout=60 * 15):
-    data = cache.get(cache_key)
+def get_cached_data(cache_key, queryset_func, timeout=60 * 15, namespace=None, tags=()):
+    if namespace is None:
+        return fetch(cache_key, queryset_func, timeout)
+
+    cache_key = make_tagged_key(namespace, cache_key, tags)
+    if not LOCAL_NAMESPACES.issuperset((namespace, *tags)):
+        return fetch(cache_key, queryset_func, timeout)
+
+    # Значение под версионным ключом не меняется, поэтому L1 достаточно
+    # знать актуальное поколение
+    data = local_cache.values.get(cache_key)
     if data is None:
-        logger.info(f"Cache MISS for key: {cache_key}")
-        data = queryset_func()
-        cache.set(cache_key, data, timeout)
-    else:
-        logger.info(f"Cache HIT for key: {cache_key}")
+        data = fetch(cache_key, queryset_func, timeout)
+        local_cache.values.set(
+            cache_key, data, min(timeout, settings.LOCAL_CACHE_TIMEOUT)
+        )
     return data
 
 
-# Утилита для инвалидации кеша по шаблону
-def invalidate_cache(cache_key_pattern):
-    keys = cache.keys(cache_key_pattern)
-    if keys:
-        cache.delete_many(keys)
+def register_cache_dependency(model, *namespaces):
+    """Регистрирует пространства имён кеша, которые зависят от данных модели."""
+    _dependencies.setdefault(model, set()).update(namespaces)
+
+
+def get_dependent_models():
+    return list(_dependencies)
+
+
+def _bump_namespaces(namespaces):
+    for namespace in sorted(namespaces):
+        bump_namespace(namespace)
+
+
+def invalidate_namespaces(namespaces):
+    """
+    Инвалидирует пространства имён после коммита транзакции, чтобы
+    параллельный запрос не успел положить в кеш старые данные.
+    """
+    if not namespaces:
+        return
+    pending = getattr(_deferred, "namespaces", None)
+    if pending is not None:
+        pending.update(namespaces)
+        return
+    transaction.on_commit(partial(_bump_namespaces, set(namespaces)))
+
+
+def invalidate_model_cache(model):
+    invalidate_namespaces(_dependencies.get(model))
+
+
+@contextmanager
+def deferred_invalidation():
+    """
+    Накапливает инвалидации внутри блока и выполняет их один раз
+    при выходе (массовый импорт, пакетные изменения).
+    """
+    if getattr(_deferred, "namespaces", None) is not None:
+        yield
+        return
+    _deferred.namespaces = set()
+    try:
+        yield
+    finally:
+        namespaces, _deferred.namespaces = _deferred.namespaces, None
+        if namespaces:
+            transaction.on_commit(partial(_bump_namespaces, namespaces))
@@ -0,0 +1,225 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.response import Response
+
+from .cache_utils import get_cached_data
+
+
+class CachedCollectionMixin:
+    """
+    Отдаёт list() из снимка уже сериализованных строк модели.
+
+    Снимок хранится в кеше как {"fields": (...), "rows": [(...), ...]},
+    а фильтрация по filterset_fields, поиск по search_fields и сортировка
+    выполняются в памяти. Запросы, которые снимок обслужить не может
+    (неизвестные параметры, lookup-префиксы поиска, связи через "__"),
+    уходят в обычный путь через SQL.
+    """
+
+    collection_cache_key = None
+    collection_namespace = None
+    collection_timeout = None
+    # Поля с относительными URL, которые нужно сделать абсолютными
+    collection_absolute_url_fields = ()
+
+    def get_collection_queryset(self):
+        return self.get_queryset()
+
+    def build_collection(self):
+        serializer = self.get_serializer_class()(
+            self.get_collection_queryset(), many=True, context={}
+        )
+        fields = tuple(
+            name
+            for name, field in serializer.child.fields.items()
+            if not field.write_only
+        )
+        rows = [tuple(item[name] for name in fields) for item in serializer.data]
+        return {"fields": fields, "rows": rows}
+
+    def get_collection(self):
+        timeout = self.collection_timeout or settings.CATALOG_CACHE_TTL
+        return get_cached_data(
+            self.collection_cache_key,
+            self.build_collection,
+            timeout,
+            namespace=self.collection_namespace,
+        )
+
+    def list(self, request, *args, **kwargs):
+        items = self.list_from_collection(request)
+        if items is None:
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(items)
+        if page is not None:
+            return self.get_paginated_response(
+                self.to_representation(page, items.fields)
+            )
+        return Response(self.to_representation(items, items.fields))
+
+    def to_representation(self, rows, fields):
+        data = [dict(zip(fields, row)) for row in rows]
+        for name in self.collection_absolute_url_fields:
+            for item in data:
+                if item.get(name):
+                    item[name] = self.request.build_absolute_uri(item[name])
+        return data
+
+    def list_from_collection(self, request):
+        backends = list(self.filter_backends)
+        supported = (DjangoFilterBackend, SearchFilter, OrderingFilter)
+        if any(not issubclass(backend, supported) for backend in backends):
+            return None
+
+        filter_fields = []
+        if DjangoFilterBackend in backends:
+            if getattr(self, "filterset_class", None):
+                return None
+            filter_fields = list(getattr(self, "filterset_fields", None) or [])
+
+        allowed_params = set(filter_fields) | {"format"}
+        search = ordering = None
+        for backend in backends:
+            if issubclass(backend, SearchFilter):
+                allowed_params.add(backend.search_param)
+                search = backend()
+            elif issubclass(backend, OrderingFilter):
+                allowed_params.add(backend.ordering_param)
+                ordering = backend()
+        if self.paginator is not None:
+            allowed_params.update(
+                name
+                for name in (
+                    getattr(self.paginator, "page_query_param", None),
+                    getattr(self.paginator, "page_size_query_param", None),
+                )
+                if name
+            )
+        if any(param not in allowed_params for param in request.query_params):
+            return None
+        # Несколько значений одного параметра django-filter объединяет по OR
+        if any(len(values) > 1 for _, values in request.query_params.lists()):
+            return None
+
+        collection = self.get_collection()
+        fields = collection["fields"]
+        rows = collection["rows"]
+        model = self.get_queryset().model
+
+        try:
+            for name in filter_fields:
+                value = request.query_params.get(name)
+                if value in (None, ""):
+                    continue
+                rows = self._filter_rows(rows, fields, model, name, value)
+        except (FieldDoesNotExist, ValidationError, LookupError):
+            return None
+        # Пустой результат может означать некорректное значение фильтра
+        if not rows and not self._filters_valid(request, filter_fields):
+            return None
+
+        if search is not None:
+            rows = self._search_rows(rows, fields, search, request)
+            if rows is None:
+                return None
+
+        if ordering is not None:
+            rows = self._order_rows(rows, fields, model, ordering, request)
+            if rows is None:
+                return None
+
+        return CollectionRows(rows, fields)
+
+    def _filters_valid(self, request, filter_fields):
+        """
+        Проверяет значения фильтров формой filterset, как это сделал бы
+        SQL-путь: некорректные значения (например, несуществующий id)
+        уходят туда и получают 400. Форма может обращаться к БД, поэтому
+        вызывается, только если фильтры не оставили ни одной строки:
+        id из непустого результата заведомо существует.
+        """
+        if not any(request.query_params.get(name) for name in filter_fields):
+            return True
+        filterset = DjangoFilterBackend().get_filterset(
+            request, self.get_queryset(), self
+        )
+        return filterset is None or filterset.is_valid()
+
+    @staticmethod
+    def _to_python(model, name):
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            field = field.target_field
+        return field.to_python
+
+    def _filter_rows(self, rows, fields, model, name, value):
+        if name not in fields:
+            raise LookupError(name)
+        to_python = self._to_python(model, name)
+        value = to_python(value)
+        index = fields.index(name)
+
+        def matches(raw):
+            if isinstance(raw, list):
+                return any(to_python(item) == value for item in raw)
+            return raw is not None and to_python(raw) == value
+
+        return [row for row in rows if matches(row[index])]
+
+    def _search_rows(self, rows, fields, search, request):
+        search_fields = search.get_search_fields(self, request)
+        terms = search.get_search_terms(request)
+        if not search_fields or not terms:
+            return rows
+        if any(str(name)[0] in search.lookup_prefixes for name in search_fields):
+            return None
+        if any(name not in fields for name in search_fields):
+            return None
+
+        indexes = [fields.index(name) for name in search_fields]
+        terms = [term.lower() for term in terms]
+
+        def matches(row):
+            values = [str(row[i]).lower() for i in indexes if row[i] is not None]
+            return all(any(term in value for value in values) for term in terms)
+
+        return [row for row in rows if matches(row)]
+
+    def _order_rows(self, rows, fields, model, ordering, request):
+        params = request.query_params.get(ordering.ordering_param)
+        if not params:
+            return rows
+        valid = ordering.get_valid_fields(
+            self.get_queryset(), self, {"request": request}
+        )
+        valid = {name for name, _ in valid}
+        terms = [term.strip() for term in params.split(",") if term.strip()]
+        if any(term.lstrip("-") not in valid for term in terms):
+            return None
+        if any(term.lstrip("-") not in fields for term in terms):
+            return None
+
+        rows = list(rows)
+        for term in reversed(terms):
+            name = term.lstrip("-")
+            index = fields.index(name)
+            to_python = self._to_python(model, name)
+            rows.sort(
+                key=lambda row: (
+                    row[index] is None,
+                    to_python(row[index]) if row[index] is not None else 0,
+                ),
+                reverse=term.startswith("-"),
+            )
+        return rows
+
+
+class CollectionRows(list):
+    """Список строк снимка вместе с именами полей."""
+
+    def __init__(self, rows, fields):
+        super().__init__(rows)
+        self.fields = fields
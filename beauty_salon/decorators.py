@@ -1,41 +1,269 @@
-from django.core.cache import cache
 from functools import wraps
+import gzip
 import hashlib
-import json
-from rest_framework.response import Response
 import logging
 
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .cache_utils import (
+    fetch,
+    get_cached_data,
+    get_generations,
+    get_last_modified,
+    make_tagged_key,
+)
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость
+    brotli = None
+
 logger = logging.getLogger(__name__)
 
-def cache_per_user(timeout):
+VIEWS_NAMESPACE = "views"
+
+# Меньшие тела не сжимаем: заголовки и CPU дороже выигрыша
+MIN_COMPRESS_SIZE = 512
+# Страницы каталога дальше этой не кешируются: номер задаёт посетитель
+MAX_CACHED_PAGE = 100
+
+
+def _compress(content):
+    variants = {}
+    if len(content) < MIN_COMPRESS_SIZE:
+        return variants
+    compressed = gzip.compress(content, compresslevel=6)
+    if len(compressed) < len(content):
+        variants["gzip"] = compressed
+    if brotli is not None:
+        compressed = brotli.compress(content, quality=5)
+        if len(compressed) < len(content):
+            variants["br"] = compressed
+    return variants
+
+
+def _choose_encoding(request, entry):
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(",")
+    }
+    for encoding in ("br", "gzip"):
+        if encoding in accepted and encoding in entry["variants"]:
+            return encoding
+    return None
+
+
+def _variant_etag(etag, encoding):
+    # У сжатых вариантов собственный ETag: байты ответа различаются
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def make_cache_entry(response):
+    content = response.content
+    return {
+        "status": response.status_code,
+        "content": content,
+        "content_type": response["Content-Type"],
+        "etag": f'"{hashlib.md5(content).hexdigest()}"',
+        "variants": _compress(content),
+    }
+
+
+def build_cached_response(request, entry):
+    """Собирает HttpResponse из закешированных байтов без сериализации."""
+    encoding = _choose_encoding(request, entry)
+    etag = _variant_etag(entry["etag"], encoding)
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match and entry["status"] == 200:
+        etags = parse_etags(if_none_match)
+        if "*" in etags or etag in etags:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            patch_vary_headers(response, ("Accept-Encoding",))
+            return response
+
+    content = entry["variants"][encoding] if encoding else entry["content"]
+    response = HttpResponse(
+        content, status=entry["status"], content_type=entry["content_type"]
+    )
+    response["ETag"] = etag
+    if encoding:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def _cache_rendered(timeout, namespace, tags, per_user):
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
-            # ключ на основе URL и пользователя
+            renderer = getattr(request, "accepted_renderer", None)
+            if not isinstance(renderer, JSONRenderer):
+                return view_func(request, *args, **kwargs)
+
+            # ключ на основе URL, пользователя и формата ответа
             path = request.build_absolute_uri()
-            user_id = request.user.id if request.user.is_authenticated else "anonymous"
-            cache_key = (
-                f"view_cache_{user_id}_{hashlib.md5(path.encode('utf-8')).hexdigest()}"
-            )
-            # получить данные из кеша
-            cached_data = cache.get(cache_key)
-            if cached_data is not None:
-                logger.info(f"View Cache HIT for key: {cache_key}")
-                # Восстанав. Response из кешированных данных
-                return Response(
-                    data=cached_data["data"],
-                    status=cached_data["status"],
-                    headers=cached_data["headers"],
+            user_id = "public"
+            if per_user:
+                user_id = (
+                    request.user.id if request.user.is_authenticated else "anonymous"
                 )
-            logger.info(f"View Cache MISS for key: {cache_key}")
+            variant = f"{path}|{request.accepted_media_type}"
+            cache_key = make_tagged_key(
+                namespace,
+                f"view_cache_{user_id}_{hashlib.md5(variant.encode('utf-8')).hexdigest()}",
+                tags(request) if tags else (),
+            )
+
+            def render():
+                response = view_func(request, *args, **kwargs)
+                response.accepted_renderer = renderer
+                response.accepted_media_type = request.accepted_media_type
+                response.renderer_context = {"request": request}
+                response.render()
+                return make_cache_entry(response)
+
+            # получить данные из кеша (пересчёт — не более чем в одном процессе)
+            entry = fetch(cache_key, render, timeout)
+            return build_cached_response(request, entry)
+
+        return _wrapped_view
+
+    return decorator
+
+
+def cache_per_user(timeout, namespace=VIEWS_NAMESPACE, tags=None):
+    """
+    Кеширует ответ представления отдельно для каждого пользователя.
+
+    В кеш кладутся уже отрендеренные байты JSON с Content-Type, ETag и
+    заранее сжатыми вариантами (gzip, brotli — если установлен). При
+    попадании ответ отдаётся без сериализатора и рендерера; остальные
+    форматы (например, Browsable API) не кешируются.
+
+    tags(request) возвращает теги записи: инкремент поколения тега
+    (см. cache_utils.invalidate_namespaces) сбрасывает только те записи,
+    которые были им помечены.
+    """
+    return _cache_rendered(timeout, namespace, tags, per_user=True)
+
+
+def cache_public(timeout, namespace=VIEWS_NAMESPACE, tags=None):
+    """
+    Как cache_per_user, но одна запись на URL для всех пользователей.
+
+    Только для ответов, которые не зависят от того, кто спрашивает
+    (публичные списки с AllowAny): иначе один пользователь увидит
+    данные другого.
+    """
+    return _cache_rendered(timeout, namespace, tags, per_user=False)
+
+
+def _page_cache_path(request, page_param):
+    """
+    Путь страницы для ключа кеша: без параметров или с одним номером
+    страницы page_param. Любой другой запрос (чужие или повторённые
+    параметры, номер не в каноническом виде или больше MAX_CACHED_PAGE)
+    даёт None — такие страницы не кешируются, чтобы произвольные query
+    string не плодили записи в Redis и не вытесняли каталог из L1.
+    """
+    query = request.GET
+    if not query:
+        return request.path
+    if list(query) != [page_param] or len(query.getlist(page_param)) > 1:
+        return None
+    page = query[page_param]
+    if not page.isdigit() or page != str(int(page)) or int(page) > MAX_CACHED_PAGE:
+        return None
+    return f"{request.path}?{page_param}={page}"
+
+
+def cache_page_for_anonymous(timeout, namespaces, page_param="page"):
+    """
+    Кеширует HTML-страницу целиком для анонимных посетителей.
+
+    Ключ включает поколения namespaces, поэтому изменение каталога сразу
+    даёт новую версию страницы, а попадание не обращается к БД (для
+    пространств каталога — и к Redis, см. get_cached_data). Страницы
+    авторизованных пользователей содержат их данные и не кешируются.
+    Из параметров запроса учитывается только номер страницы page_param
+    (см. _page_cache_path).
+    """
+    namespace, *tags = namespaces
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method != "GET" or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            path = _page_cache_path(request, page_param)
+            if path is None:
+                return view_func(request, *args, **kwargs)
+            entry = get_cached_data(
+                f"page_{hashlib.md5(path.encode('utf-8')).hexdigest()}",
+                lambda: make_cache_entry(view_func(request, *args, **kwargs)),
+                timeout,
+                namespace=namespace,
+                tags=tags,
+            )
+            return build_cached_response(request, entry)
+
+        return _wrapped_view
+
+    return decorator
+
+
+def conditional_get(namespace, tags=None, vary_on=None, last_modified=True):
+    """
+    Условный GET по версии данных: ETag и Last-Modified вычисляются из
+    поколений пространства имён и тегов (см. cache_utils), поэтому
+    неизменившаяся коллекция отвечает 304 без обращения к сериализатору
+    и к строкам БД.
+
+    vary_on(request) добавляет в ETag значение, от которого ответ зависит
+    помимо данных (например, текущая дата); для таких ответов
+    Last-Modified обычно отключают.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+
+            generations = get_generations([namespace, *(tags(request) if tags else ())])
+            version = ".".join(str(generations[name]) for name in sorted(generations))
+            parts = [
+                request.build_absolute_uri(),
+                str(getattr(request, "accepted_media_type", "")),
+                str(request.user.pk),
+                version,
+                vary_on(request) if vary_on else "",
+            ]
+            etag = f'W/"{hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()}"'
+            modified = None
+            if last_modified:
+                modified = get_last_modified(generations)
+                modified = int(modified) if modified is not None else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified
+            )
+            if response is not None:
+                return response
+
             response = view_func(request, *args, **kwargs)
-            # Получаем данные из response для кеширования
-            cache_data = {
-                "data": response.data,
-                "status": response.status_code,
-                "headers": dict(response.headers),
-            }
-            cache.set(cache_key, cache_data, timeout)
+            if response.status_code == 200:
+                response["ETag"] = etag
+                if modified is not None:
+                    response["Last-Modified"] = http_date(modified)
             return response
+
         return _wrapped_view
+
     return decorator
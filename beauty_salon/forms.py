@@ -4,6 +4,8 @@ from django.contrib.auth.models import Group, User
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .availability import describe_conflict, find_conflicts
+from .holds import find_hold_conflicts
 from .models import Appointment, Client, Employee, Review, Service
 
 
@@ -35,6 +37,7 @@ class AppointmentForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
+        self.user = user
         if user and user.is_authenticated:
             self.fields["employee"].queryset = Employee.objects.none()
 
@@ -68,6 +71,27 @@ class AppointmentForm(forms.ModelForm):
             if appointment_datetime < timezone.now():
                 raise ValidationError("Нельзя записаться на прошедшую дату и время.")
 
+        employee = cleaned_data.get("employee")
+        service = cleaned_data.get("service")
+        if employee and service and date and time:
+            # Чужие временные брони (API) занимают слот так же, как записи
+            held = find_hold_conflicts(
+                employee.pk,
+                date,
+                time,
+                service,
+                user_id=self.user.pk if self.user else None,
+            )
+            if held:
+                raise ValidationError(
+                    "Это время временно забронировано другим клиентом."
+                )
+            conflicts = find_conflicts(
+                employee.pk, date, time, service, exclude_pk=self.instance.pk
+            )
+            if conflicts:
+                raise ValidationError(describe_conflict(conflicts))
+
         return cleaned_data
 
 
@@ -0,0 +1,182 @@
+from datetime import date, timedelta
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .availability import describe_conflict, get_span
+from .booking import BookingConflict
+
+logger = logging.getLogger(__name__)
+
+# Временные брони слотов живут только в Redis:
+#   hold:<id>                 — данные брони (истекает сама по TTL)
+#   holds:<мастер>:<дата>     — ZSET id броней дня, score — время истечения
+#   holds:expiry              — ZSET "<мастер>:<дата>:<id>" для уборщика
+HOLD_KEY_PREFIX = "hold"
+DAY_KEY_PREFIX = "holds"
+EXPIRY_KEY = "holds:expiry"
+HOLD_LOCK_TIMEOUT = 5
+HOLD_LOCK_WAIT = 2
+
+
+class HoldConflict(BookingConflict):
+    default_detail = "Это время временно забронировано."
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _hold_key(hold_id):
+    return f"{HOLD_KEY_PREFIX}:{hold_id}"
+
+
+def _day_key(employee_id, day):
+    return f"{DAY_KEY_PREFIX}:{employee_id}:{day}"
+
+
+def _overlapping(holds, begin, end, user_id=None):
+    return sorted(
+        (hold["start"], hold["end"])
+        for hold in holds
+        if hold["user"] != user_id and hold["start"] < end and hold["end"] > begin
+    )
+
+
+def _active_holds(redis, employee_id, day):
+    """
+    Действующие брони дня мастера. Истёкшие пропускаются, но остаются
+    в индексе дня до release_expired_holds или истечения его ключа.
+    """
+    day_key = _day_key(employee_id, day)
+    hold_ids = redis.zrangebyscore(day_key, time.time(), "+inf")
+    if not hold_ids:
+        return []
+    values = redis.mget([_hold_key(hold_id.decode()) for hold_id in hold_ids])
+    return [json.loads(value) for value in values if value is not None]
+
+
+def get_held_spans(employee_ids, date_from, date_to):
+    """
+    {(мастер, дата): [(начало, конец)]} действующих броней за период —
+    один конвейер запросов к Redis.
+    """
+    days = [
+        date_from + timedelta(days=offset)
+        for offset in range((date_to - date_from).days + 1)
+    ]
+    keys = [(employee_id, day) for employee_id in employee_ids for day in days]
+
+    try:
+        redis = _redis()
+    except NotImplementedError:
+        # Кеш не Redis — броней быть не может
+        return {}
+    now = time.time()
+    pipe = redis.pipeline(transaction=False)
+    for employee_id, day in keys:
+        pipe.zrangebyscore(_day_key(employee_id, day), now, "+inf")
+    hold_ids = [hold_id.decode() for ids in pipe.execute() for hold_id in ids]
+    if not hold_ids:
+        return {}
+
+    result = {}
+    for value in redis.mget([_hold_key(hold_id) for hold_id in hold_ids]):
+        if value is None:
+            continue
+        hold = json.loads(value)
+        key = (hold["employee"], date.fromisoformat(hold["date"]))
+        result.setdefault(key, []).append((hold["start"], hold["end"]))
+    return result
+
+
+def find_hold_conflicts(employee_id, day, start, service, user_id=None):
+    """Чужие брони, пересекающиеся с интервалом записи на service."""
+    try:
+        redis = _redis()
+    except NotImplementedError:
+        # Кеш не Redis — броней быть не может
+        return []
+    begin, end = get_span(start, service.duration, service.buffer)
+    return _overlapping(_active_holds(redis, employee_id, day), begin, end, user_id)
+
+
+def place_hold(user_id, employee_id, service, day, start):
+    """
+    Ставит временную бронь на SLOT_HOLD_TIMEOUT секунд.
+
+    Проверка броней и запись выполняются под блокировкой дня мастера
+    в Redis, поэтому из одновременных запросов слот получит только один.
+    """
+    redis = _redis()
+    timeout = settings.SLOT_HOLD_TIMEOUT
+    begin, end = get_span(start, service.duration, service.buffer)
+    day_key = _day_key(employee_id, day)
+    lock = redis.lock(
+        f"lock:{day_key}", timeout=HOLD_LOCK_TIMEOUT, blocking_timeout=HOLD_LOCK_WAIT
+    )
+    if not lock.acquire():
+        raise HoldConflict("Слот сейчас бронируют, попробуйте ещё раз.")
+    try:
+        conflicts = _overlapping(_active_holds(redis, employee_id, day), begin, end)
+        if conflicts:
+            raise HoldConflict(describe_conflict(conflicts))
+
+        hold = {
+            "id": uuid.uuid4().hex,
+            "user": user_id,
+            "employee": employee_id,
+            "service": service.pk,
+            "date": day.isoformat(),
+            "time": start.strftime("%H:%M"),
+            "start": begin,
+            "end": end,
+            "expires_at": time.time() + timeout,
+        }
+        pipe = redis.pipeline()
+        pipe.set(_hold_key(hold["id"]), json.dumps(hold), ex=timeout)
+        pipe.zadd(day_key, {hold["id"]: hold["expires_at"]})
+        pipe.expire(day_key, timeout * 2)
+        pipe.zadd(EXPIRY_KEY, {f"{employee_id}:{day}:{hold['id']}": hold["expires_at"]})
+        pipe.execute()
+        return hold
+    finally:
+        lock.release()
+
+
+def get_hold(hold_id, user_id):
+    value = _redis().get(_hold_key(hold_id))
+    if value is None:
+        return None
+    hold = json.loads(value)
+    return hold if hold["user"] == user_id else None
+
+
+def release_hold(hold):
+    redis = _redis()
+    pipe = redis.pipeline()
+    pipe.delete(_hold_key(hold["id"]))
+    pipe.zrem(_day_key(hold["employee"], hold["date"]), hold["id"])
+    pipe.zrem(EXPIRY_KEY, f"{hold['employee']}:{hold['date']}:{hold['id']}")
+    pipe.execute()
+
+
+def release_expired_holds():
+    """Убирает истёкшие брони из индексов дней. Возвращает их количество."""
+    redis = _redis()
+    members = redis.zrangebyscore(EXPIRY_KEY, "-inf", time.time())
+    if not members:
+        return 0
+    pipe = redis.pipeline()
+    for member in members:
+        employee_id, day, hold_id = member.decode().split(":")
+        pipe.zrem(_day_key(employee_id, day), hold_id)
+        pipe.delete(_hold_key(hold_id))
+    pipe.zrem(EXPIRY_KEY, *members)
+    pipe.execute()
+    logger.info(f"Released {len(members)} expired slot holds")
+    return len(members)
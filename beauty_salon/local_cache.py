@@ -0,0 +1,152 @@
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Канал Redis, в который публикуются инкременты поколений
+INVALIDATION_CHANNEL = "cache:invalidate"
+# Пока подписчик не работает, поколения в памяти живут совсем недолго
+FALLBACK_GENERATION_TIMEOUT = 2
+RECONNECT_DELAY = 5
+
+_missing = object()
+
+
+class LocalCache:
+    """Ограниченный LRU-кеш с TTL в памяти процесса (потокобезопасный)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _missing)
+            if item is _missing:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+values = LocalCache(settings.LOCAL_CACHE_MAX_ENTRIES)
+generations = LocalCache(settings.LOCAL_CACHE_MAX_ENTRIES)
+
+# Счётчик сбросов поколения: не даёт запомнить значение, прочитанное
+# из Redis до того, как пришло сообщение об инвалидации
+_epochs = {}
+_global_epoch = 0
+_epochs_lock = threading.Lock()
+
+_subscriber_pid = None
+_subscriber_healthy = threading.Event()
+_subscriber_lock = threading.Lock()
+
+
+def _get_redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def generation_timeout():
+    if _subscriber_healthy.is_set():
+        return settings.LOCAL_CACHE_TIMEOUT
+    return FALLBACK_GENERATION_TIMEOUT
+
+
+def get_generation(namespace):
+    """Возвращает (поколение или None, эпоха) из памяти процесса."""
+    return generations.get(namespace), (_global_epoch, _epochs.get(namespace, 0))
+
+
+def remember_generation(namespace, generation, epoch):
+    with _epochs_lock:
+        if (_global_epoch, _epochs.get(namespace, 0)) == epoch:
+            generations.set(namespace, generation, generation_timeout())
+
+
+def forget_generation(namespace):
+    with _epochs_lock:
+        _epochs[namespace] = _epochs.get(namespace, 0) + 1
+        generations.delete(namespace)
+
+
+def forget_all_generations():
+    global _global_epoch
+    with _epochs_lock:
+        _global_epoch += 1
+        generations.clear()
+
+
+def publish_invalidation(namespace):
+    forget_generation(namespace)
+    try:
+        _get_redis().publish(INVALIDATION_CHANNEL, namespace)
+    except Exception:
+        logger.warning(
+            "Failed to publish invalidation for %s", namespace, exc_info=True
+        )
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = _get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Всё, что закешировано до подписки, могло пропустить сообщения
+            forget_all_generations()
+            _subscriber_healthy.set()
+            for message in pubsub.listen():
+                namespace = message["data"]
+                if isinstance(namespace, bytes):
+                    namespace = namespace.decode()
+                forget_generation(namespace)
+        except NotImplementedError:
+            # Кеш не Redis — работаем только на коротком TTL
+            return
+        except Exception:
+            logger.warning("Cache invalidation subscriber failed", exc_info=True)
+        _subscriber_healthy.clear()
+        time.sleep(RECONNECT_DELAY)
+
+
+def ensure_subscriber():
+    """Запускает подписчика в текущем процессе (после fork — заново)."""
+    global _subscriber_pid
+    if _subscriber_pid == os.getpid():
+        return
+    with _subscriber_lock:
+        if _subscriber_pid == os.getpid():
+            return
+        _subscriber_pid = os.getpid()
+        _subscriber_healthy.clear()
+        values.clear()
+        forget_all_generations()
+        threading.Thread(
+            target=_listen, name="cache-invalidation-subscriber", daemon=True
+        ).start()
@@ -0,0 +1,85 @@
+import re
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from beauty_salon.cache_utils import (
+    GENERATION_KEY_PREFIX,
+    get_counters,
+    get_generations,
+)
+
+# Ключи вида "<namespace>:v<поколение>[.<поколения тегов>]:<ключ>"
+VERSIONED_KEY_RE = re.compile(r"^(?P<namespace>[^:]+):v(?P<generation>\d+)[\d.]*:")
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает количество ключей кеша по пространствам имён. "
+        "Использует SCAN порциями, не блокируя Redis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--itersize",
+            type=int,
+            default=500,
+            help="Размер порции SCAN (по умолчанию 500).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.01,
+            help="Пауза в секундах между порциями (по умолчанию 0.01).",
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, "iter_keys"):
+            raise CommandError("Кеш не поддерживает SCAN (нужен django_redis).")
+
+        itersize = options["itersize"]
+        pause = options["pause"]
+        counts = Counter()
+        other = Counter()
+        generation_keys = 0
+
+        for number, key in enumerate(cache.iter_keys("*", itersize=itersize), 1):
+            match = VERSIONED_KEY_RE.match(key)
+            if match:
+                counts[(match["namespace"], int(match["generation"]))] += 1
+            elif key.startswith(f"{GENERATION_KEY_PREFIX}:"):
+                generation_keys += 1
+            else:
+                other[re.split(r"[:.]", key, maxsplit=1)[0]] += 1
+            if pause and number % itersize == 0:
+                time.sleep(pause)
+
+        namespaces = sorted({namespace for namespace, _ in counts})
+        current = get_generations(namespaces) if namespaces else {}
+
+        self.stdout.write(
+            f"{'Пространство':<20}{'Поколение':>16}{'Актуальные':>12}{'Устаревшие':>12}"
+        )
+        for namespace in namespaces:
+            live = stale = 0
+            for (name, generation), count in counts.items():
+                if name != namespace:
+                    continue
+                if generation == current[namespace]:
+                    live += count
+                else:
+                    stale += count
+            self.stdout.write(
+                f"{namespace:<20}{current[namespace]:>16}{live:>12}{stale:>12}"
+            )
+
+        self.stdout.write(f"Ключей поколений: {generation_keys}")
+        counters = get_counters(["coalesced", "refreshed", "lock_timeouts"])
+        self.stdout.write(
+            "Объединено запросов: {coalesced}, фоновых пересчётов: {refreshed}, "
+            "таймаутов ожидания: {lock_timeouts}".format(**counters)
+        )
+        for prefix, count in sorted(other.items()):
+            self.stdout.write(f"Прочие ({prefix}): {count}")
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from beauty_salon.retention import purge_appointments, purge_day_locks
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет старые записи пачками короткими транзакциями "
+        "(то же, что задача delete_old_appointments) и печатает прогресс."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.APPOINTMENT_RETENTION_DAYS,
+            help="Удалять записи старше стольких дней "
+            f"(по умолчанию {settings.APPOINTMENT_RETENTION_DAYS}).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.PURGE_BATCH_SIZE,
+            help=f"Размер пачки (по умолчанию {settings.PURGE_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=settings.PURGE_BATCH_PAUSE,
+            help="Пауза в секундах между пачками "
+            f"(по умолчанию {settings.PURGE_BATCH_PAUSE}).",
+        )
+        parser.add_argument(
+            "--archive",
+            help="Файл, в который перед удалением дописываются записи (JSON Lines).",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timezone.timedelta(days=options["days"])
+
+        def progress(deleted, last_pk):
+            self.stdout.write(f"Удалено: {deleted} (до id {last_pk})")
+
+        purge = dict(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            progress=progress,
+        )
+        if options["archive"]:
+            with open(options["archive"], "a", encoding="utf-8") as archive:
+                deleted = purge_appointments(cutoff, archive=archive, **purge)
+        else:
+            deleted = purge_appointments(cutoff, **purge)
+        locks = purge_day_locks(timezone.localdate())
+        self.stdout.write(
+            self.style.SUCCESS(f"Удалено записей: {deleted}, блокировок дней: {locks}")
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 06:39
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("beauty_salon", "0017_category_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="service",
+            name="buffer",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Перерыв после услуги, мин"
+            ),
+        ),
+        migrations.AddField(
+            model_name="service",
+            name="duration",
+            field=models.PositiveSmallIntegerField(
+                default=60,
+                validators=[django.core.validators.MinValueValidator(1)],
+                verbose_name="Длительность, мин",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["employee", "date", "time"],
+                name="appointment_employee_slot_idx",
+            ),
+        ),
+    ]
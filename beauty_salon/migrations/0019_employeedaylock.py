@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 06:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("beauty_salon", "0018_service_duration_appointment_slot_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmployeeDayLock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("locked_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="beauty_salon.employee",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Блокировка дня мастера",
+                "verbose_name_plural": "Блокировки дней мастеров",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("employee", "date"), name="unique_employee_day_lock"
+                    )
+                ],
+            },
+        ),
+    ]
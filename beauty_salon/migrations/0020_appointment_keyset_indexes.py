@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("beauty_salon", "0019_employeedaylock"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["date", "time", "id"], name="appointment_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["client", "date", "time", "id"],
+                name="appointment_client_recent_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2 on 2026-10-18 06:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("beauty_salon", "0020_appointment_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "channel",
+                    models.CharField(
+                        choices=[("email", "Email")],
+                        max_length=10,
+                        verbose_name="Канал",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("24h", "За сутки"), ("2h", "За 2 часа")],
+                        max_length=10,
+                        verbose_name="Вид",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "В очереди"),
+                            ("sending", "Отправляется"),
+                            ("sent", "Отправлено"),
+                            ("failed", "Ошибка"),
+                            ("skipped", "Пропущено"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Отправлено"
+                    ),
+                ),
+                (
+                    "appointment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminders",
+                        to="beauty_salon.appointment",
+                        verbose_name="Запись",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Напоминание",
+                "verbose_name_plural": "Напоминания",
+                "indexes": [
+                    models.Index(fields=["status"], name="reminder_status_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("appointment", "channel", "kind"),
+                        name="unique_appointment_reminder",
+                    )
+                ],
+            },
+        ),
+    ]
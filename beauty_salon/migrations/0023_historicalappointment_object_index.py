@@ -0,0 +1,23 @@
+from django.db import migrations
+
+# Индекс создаётся вручную: модель истории генерирует simple_history,
+# и индекс в её Meta не объявить
+INDEX_NAME = "hist_appointment_object_idx"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("beauty_salon", "0022_appointment_created_index"),
+    ]
+
+    operations = [
+        # История одной записи в админке: WHERE id = ... ORDER BY history_date
+        migrations.RunSQL(
+            sql=(
+                f"CREATE INDEX {INDEX_NAME} "
+                "ON beauty_salon_historicalappointment (id, history_date)"
+            ),
+            reverse_sql=f"DROP INDEX {INDEX_NAME}",
+        ),
+    ]
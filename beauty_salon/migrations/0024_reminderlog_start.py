@@ -0,0 +1,55 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_start(apps, schema_editor):
+    # Уже занесённые напоминания относятся к текущему времени записи
+    Appointment = apps.get_model("beauty_salon", "Appointment")
+    ReminderLog = apps.get_model("beauty_salon", "ReminderLog")
+    appointment = Appointment.objects.filter(pk=OuterRef("appointment_id"))
+    ReminderLog.objects.update(
+        date=Subquery(appointment.values("date")[:1]),
+        time=Subquery(appointment.values("time")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("beauty_salon", "0023_historicalappointment_object_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminderlog",
+            name="date",
+            field=models.DateField(null=True, verbose_name="Дата записи"),
+        ),
+        migrations.AddField(
+            model_name="reminderlog",
+            name="time",
+            field=models.TimeField(null=True, verbose_name="Время записи"),
+        ),
+        migrations.RunPython(fill_start, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="reminderlog",
+            name="date",
+            field=models.DateField(verbose_name="Дата записи"),
+        ),
+        migrations.AlterField(
+            model_name="reminderlog",
+            name="time",
+            field=models.TimeField(verbose_name="Время записи"),
+        ),
+        migrations.RemoveConstraint(
+            model_name="reminderlog",
+            name="unique_appointment_reminder",
+        ),
+        migrations.AddConstraint(
+            model_name="reminderlog",
+            constraint=models.UniqueConstraint(
+                fields=("appointment", "channel", "kind", "date", "time"),
+                name="unique_appointment_start_reminder",
+            ),
+        ),
+    ]
@@ -30,6 +30,12 @@ class Service(models.Model):
     name = models.CharField(max_length=255, verbose_name="Наименование услуги")
     description = models.TextField(blank=True, null=True, verbose_name="Описание")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
+    duration = models.PositiveSmallIntegerField(
+        default=60, validators=[MinValueValidator(1)], verbose_name="Длительность, мин"
+    )
+    buffer = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Перерыв после услуги, мин"
+    )
 
     class Meta:
         verbose_name = "Услуга"
@@ -99,11 +105,102 @@ class Appointment(models.Model):
         verbose_name = "Запись"
         verbose_name_plural = "Записи"
         ordering = ["-date", "-time"]
+        indexes = [
+            # Проверка пересечений и расписание мастера — диапазон по времени
+            models.Index(
+                fields=["employee", "date", "time"],
+                name="appointment_employee_slot_idx",
+            ),
+            # Постраничный вывод по ключу (date, time, id), см. pagination.py
+            models.Index(fields=["date", "time", "id"], name="appointment_recent_idx"),
+            models.Index(
+                fields=["client", "date", "time", "id"],
+                name="appointment_client_recent_idx",
+            ),
+            # Очистка старых записей (см. retention.py)
+            models.Index(fields=["created_at"], name="appointment_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.client.name} - {self.date} {self.time}"
 
 
+class EmployeeDayLock(models.Model):
+    """
+    Строка-блокировка дня мастера: бронирования одного мастера на одну дату
+    выполняются по очереди (см. booking.reserve).
+    """
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    date = models.DateField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Блокировка дня мастера"
+        verbose_name_plural = "Блокировки дней мастеров"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["employee", "date"], name="unique_employee_day_lock"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.date}"
+
+
+class ReminderLog(models.Model):
+    """
+    Журнал напоминаний: не больше одной строки на запись, канал, вид
+    напоминания и время начала записи, поэтому повторный запуск рассылки
+    не отправит его снова, а перенесённая запись получит новое.
+    """
+
+    CHANNEL_CHOICES = [("email", "Email")]
+    KIND_CHOICES = [("24h", "За сутки"), ("2h", "За 2 часа")]
+    STATUS_CHOICES = [
+        ("pending", "В очереди"),
+        ("sending", "Отправляется"),
+        ("sent", "Отправлено"),
+        ("failed", "Ошибка"),
+        ("skipped", "Пропущено"),
+    ]
+
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.CASCADE,
+        related_name="reminders",
+        verbose_name="Запись",
+    )
+    channel = models.CharField(
+        max_length=10, choices=CHANNEL_CHOICES, verbose_name="Канал"
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Вид")
+    # Дата и время записи, о которых напоминаем
+    date = models.DateField(verbose_name="Дата записи")
+    time = models.TimeField(verbose_name="Время записи")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default="pending",
+        verbose_name="Статус",
+    )
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    class Meta:
+        verbose_name = "Напоминание"
+        verbose_name_plural = "Напоминания"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["appointment", "channel", "kind", "date", "time"],
+                name="unique_appointment_start_reminder",
+            ),
+        ]
+        indexes = [models.Index(fields=["status"], name="reminder_status_idx")]
+
+    def __str__(self):
+        return f"{self.appointment} - {self.kind} ({self.get_status_display()})"
+
+
 class Product(models.Model):
     category = models.ForeignKey(
         Category,
@@ -0,0 +1,144 @@
+import base64
+import json
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Дальше этого числа строк точный COUNT не считаем
+COUNT_LIMIT = 1000
+
+
+def estimate_count(queryset):
+    """
+    Приблизительное число строк: для нефильтрованной таблицы PostgreSQL —
+    из статистики планировщика, иначе — COUNT не дальше COUNT_LIMIT строк.
+    Возвращает (число, приблизительно ли оно).
+    """
+    if connection.vendor == "postgresql" and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0], True
+    count = queryset.order_by()[: COUNT_LIMIT + 1].count()
+    return min(count, COUNT_LIMIT), count > COUNT_LIMIT
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу сортировки вместо OFFSET: следующая страница
+    начинается после последней строки предыдущей, поэтому стоимость запроса
+    не зависит от глубины, а COUNT(*) не выполняется.
+
+    ordering должен однозначно упорядочивать строки (последним — id) и
+    опираться на составной индекс. ?count=1 добавляет в ответ оценку числа
+    строк (см. estimate_count).
+    """
+
+    ordering = ("-date", "-time", "-id")
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, item):
+        values = [str(getattr(item, name.lstrip("-"))) for name in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, queryset, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            fields = [
+                queryset.model._meta.get_field(name.lstrip("-"))
+                for name in self.ordering
+            ]
+            if len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except Exception:
+            raise NotFound("Некорректный курсор.")
+
+    def get_position_filter(self, values):
+        # (a, b, c) после (x, y, z): a > x или (a = x и (b > y или ...))
+        condition = Q()
+        for name, value in reversed(list(zip(self.ordering, values))):
+            field = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            after = Q(**{f"{field}__{lookup}": value})
+            condition = (
+                after if not condition else after | (Q(**{field: value}) & condition)
+            )
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.count = None
+
+        queryset = queryset.order_by(*self.ordering)
+        if request.query_params.get(self.count_query_param):
+            self.count = estimate_count(queryset)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(
+                self.get_position_filter(self.decode_cursor(queryset, cursor))
+            )
+
+        page = list(queryset[: self.page_size_value + 1])
+        self.has_next = len(page) > self.page_size_value
+        page = page[: self.page_size_value]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "first": self.get_first_link()}
+        if self.count is not None:
+            payload["count"], payload["count_is_estimate"] = self.count
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "first": {"type": "string", "format": "uri"},
+                "count": {"type": "integer"},
+                "count_is_estimate": {"type": "boolean"},
+                "results": schema,
+            },
+        }
+
+
+class ReviewPagination(KeysetPagination):
+    """Отзывы — от новых к старым, по первичному ключу."""
+
+    ordering = ("-id",)
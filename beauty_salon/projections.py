@@ -0,0 +1,98 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+Projection = namedtuple("Projection", ["select_related", "prefetch_related", "only"])
+
+
+def _walk(serializer, model, prefix, state):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*":
+            # SerializerMethodField и т.п.: зависимости задаёт представление
+            continue
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        current, path = model, prefix
+        attrs = field.source_attrs
+        for position, attr in enumerate(attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Свойство или метод модели — набор колонок не вывести
+                state["complete"] = False
+                break
+            name = f"{path}{attr}"
+            if model_field.many_to_many or model_field.one_to_many:
+                state["prefetch_related"].add(name)
+                break
+            state["only"].add(name)
+            last = position == len(attrs) - 1
+            if not model_field.is_relation or (
+                last and not isinstance(nested, serializers.BaseSerializer)
+            ):
+                continue
+            state["select_related"].add(name)
+            current, path = model_field.related_model, f"{name}__"
+            if last:
+                _walk(nested, current, path, state)
+
+
+@lru_cache(maxsize=None)
+def get_projection(serializer_class, extra=()):
+    """
+    Выводит из объявленных полей сериализатора select_related, prefetch_related
+    и only(), достаточные для его вывода без дополнительных запросов.
+
+    extra — пути, которые сериализатор читает неявно (SerializerMethodField),
+    например "client__user". Если поле ссылается на свойство модели,
+    only() не применяется (возвращается None).
+    """
+    serializer = serializer_class(context={})
+    model = serializer.Meta.model
+    state = {
+        "select_related": set(),
+        "prefetch_related": set(),
+        "only": set(),
+        "complete": True,
+    }
+    _walk(serializer, model, "", state)
+    for path in extra:
+        current, prefix = model, ""
+        for attr in path.split("__"):
+            model_field = current._meta.get_field(attr)
+            name = f"{prefix}{attr}"
+            state["only"].add(name)
+            if not model_field.is_relation:
+                break
+            state["select_related"].add(name)
+            current, prefix = model_field.related_model, f"{name}__"
+    return Projection(
+        tuple(sorted(state["select_related"])),
+        tuple(sorted(state["prefetch_related"])),
+        tuple(sorted(state["only"])) if state["complete"] else None,
+    )
+
+
+class ProjectionMixin:
+    """
+    Подгружает в get_queryset() ровно то, что выводит сериализатор:
+    связи — одним JOIN, колонки — через only() (только для чтения, чтобы
+    сохранение и история изменений видели все поля).
+    """
+
+    projection_extra = ()
+
+    def project(self, queryset):
+        projection = get_projection(
+            self.get_serializer_class(), tuple(self.projection_extra)
+        )
+        queryset = queryset.select_related(*projection.select_related)
+        if projection.prefetch_related:
+            queryset = queryset.prefetch_related(*projection.prefetch_related)
+        if projection.only is not None and self.request.method in SAFE_METHODS:
+            queryset = queryset.only(*projection.only)
+        return queryset
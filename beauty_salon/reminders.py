@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta
+from smtplib import SMTPRecipientsRefused
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Appointment, ReminderLog
+
+# Статусы записей, о которых напоминаем
+REMINDER_STATUSES = ("pending", "confirmed")
+CHANNEL = "email"
+# Вид напоминания и за сколько до начала записи оно уходит;
+# окно каждого вида заканчивается там, где начинается окно следующего
+REMINDER_WINDOWS = [("24h", timedelta(hours=24)), ("2h", timedelta(hours=2))]
+
+FROM_EMAIL = "Bellezza Salon <bellezza@example.com>"
+
+
+def starts_between(begin, end):
+    """Условие «запись начинается в (begin, end]» по полям date и time."""
+    begin, end = timezone.localtime(begin), timezone.localtime(end)
+    if begin.date() == end.date():
+        return Q(date=begin.date(), time__gt=begin.time(), time__lte=end.time())
+    return (
+        Q(date=begin.date(), time__gt=begin.time())
+        | Q(date__gt=begin.date(), date__lt=end.date())
+        | Q(date=end.date(), time__lte=end.time())
+    )
+
+
+def get_start(appointment):
+    return timezone.make_aware(datetime.combine(appointment.date, appointment.time))
+
+
+def plan_reminders(now=None):
+    """
+    Заносит в журнал (ReminderLog) напоминания, срок которых наступил:
+    по одной строке на запись, вид и время начала, одним bulk_create. Уже
+    занесённые пропускаются, поэтому планировщик можно запускать сколько
+    угодно часто; перенесённая запись получает напоминания заново.
+    Возвращает число действительно добавленных строк.
+    """
+    now = now or timezone.now()
+    logs = []
+    nearer_leads = [lead for _, lead in REMINDER_WINDOWS[1:]] + [timedelta(0)]
+    for (kind, lead), nearer in zip(REMINDER_WINDOWS, nearer_leads):
+        begin = now + nearer
+        already = ReminderLog.objects.filter(
+            appointment=OuterRef("pk"),
+            channel=CHANNEL,
+            kind=kind,
+            date=OuterRef("date"),
+            time=OuterRef("time"),
+        )
+        ids = (
+            Appointment.objects.filter(
+                starts_between(begin, now + lead), status__in=REMINDER_STATUSES
+            )
+            .filter(~Exists(already))
+            .values_list("id", "date", "time")
+        )
+        logs += [
+            ReminderLog(
+                appointment_id=pk, channel=CHANNEL, kind=kind, date=day, time=start
+            )
+            for pk, day, start in ids
+        ]
+    if not logs:
+        return 0
+    # Параллельный запуск мог успеть раньше: дубликаты отсекает ограничение,
+    # а bulk_create с ignore_conflicts не сообщает, сколько строк вставлено
+    ledger = ReminderLog.objects.filter(
+        appointment_id__in={log.appointment_id for log in logs}
+    )
+    with transaction.atomic():
+        before = ledger.count()
+        ReminderLog.objects.bulk_create(logs, ignore_conflicts=True)
+        return ledger.count() - before
+
+
+def requeue_stale(now=None):
+    """
+    Возвращает в очередь строки журнала, которые захватила на отправку
+    задача, не дожившая до записи итога (воркер убит): захват старше
+    REMINDER_SENDING_LEASE секунд считается потерянным. Возвращает их число.
+    """
+    now = now or timezone.now()
+    lease = timedelta(seconds=settings.REMINDER_SENDING_LEASE)
+    return ReminderLog.objects.filter(status="sending", sent_at__lt=now - lease).update(
+        status="pending", sent_at=None
+    )
+
+
+def iter_pending_batches(batch_size=None):
+    """Id строк журнала в очереди, списками по batch_size."""
+    batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+    ids = (
+        ReminderLog.objects.filter(status="pending")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    batch = []
+    for pk in ids.iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_reminder(appointment):
+    return EmailMessage(
+        subject=(
+            f"Bellezza Salon: Напоминание о записи на {appointment.date} "
+            f"в {appointment.time}"
+        ),
+        body=(
+            f"Здравствуйте {appointment.client.name}!\n\n"
+            f"Салон красоты Bellezza напоминает, что вы записаны на услугу:\n"
+            f"• Услуга: {appointment.service.name}\n"
+            f"• Мастер: {appointment.employee.name}\n"
+            f"• Дата и время: {appointment.date} в {appointment.time}\n\n"
+            f"Ждем вас в нашем салоне по адресу: [Москва, Большая Якиманка 26]\n"
+            f"Телефон для связи: [+7 917 814 98 41 ]\n\n"
+            f"С уважением,\n"
+            f"Команда салона красоты Bellezza"
+        ),
+        from_email=FROM_EMAIL,
+        to=[appointment.client.email],
+    )
+
+
+def claim(log_ids):
+    """
+    Переводит строки журнала из очереди в «отправляется» одним UPDATE.
+    Время захвата служит меткой: возвращаются только строки, захваченные
+    этим вызовом, так что две задачи не отправят одно письмо дважды.
+    """
+    claimed_at = timezone.now()
+    ReminderLog.objects.filter(pk__in=log_ids, status="pending").update(
+        status="sending", sent_at=claimed_at
+    )
+    return list(
+        ReminderLog.objects.filter(pk__in=log_ids, status="sending", sent_at=claimed_at)
+        .select_related(
+            "appointment__client", "appointment__service", "appointment__employee"
+        )
+        .order_by("id")
+    )
+
+
+def send_reminders(log_ids):
+    """
+    Отправляет напоминания по строкам журнала log_ids через одно
+    SMTP-соединение и записывает итог каждой строки. Если соединение
+    оборвалось, неотправленные строки возвращаются в очередь, а ошибка
+    пробрасывается (задача повторится). Возвращает число отправленных.
+    """
+    logs = claim(log_ids)
+    now = timezone.now()
+    outcome = {"sent": [], "failed": [], "skipped": []}
+    to_send = []
+    for log in logs:
+        appointment = log.appointment
+        # Запись перенесли после планирования: напоминание о ней устарело
+        moved = (appointment.date, appointment.time) != (log.date, log.time)
+        if (
+            not moved
+            and appointment.status in REMINDER_STATUSES
+            and get_start(appointment) > now
+        ):
+            to_send.append(log)
+        else:
+            outcome["skipped"].append(log.pk)
+
+    try:
+        if to_send:
+            with get_connection(fail_silently=False) as connection:
+                for log in to_send:
+                    try:
+                        connection.send_messages([build_reminder(log.appointment)])
+                    except SMTPRecipientsRefused:
+                        outcome["failed"].append(log.pk)
+                    else:
+                        outcome["sent"].append(log.pk)
+    finally:
+        finished_at = timezone.now()
+        done = set()
+        for status, ids in outcome.items():
+            if ids:
+                ReminderLog.objects.filter(pk__in=ids).update(
+                    status=status, sent_at=finished_at
+                )
+                done.update(ids)
+        unsent = [log.pk for log in logs if log.pk not in done]
+        if unsent:
+            ReminderLog.objects.filter(pk__in=unsent).update(
+                status="pending", sent_at=None
+            )
+    return len(outcome["sent"])
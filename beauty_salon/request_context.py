@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from .cache_utils import EMPLOYEES_NAMESPACE, get_cached_data
+from .models import Client, Employee
+
+
+def get_employee_services():
+    """Множество пар (мастер, услуга) — из кеша каталога (и памяти процесса)."""
+    return get_cached_data(
+        "employee_services",
+        lambda: set(
+            Employee.services.through.objects.values_list("employee_id", "service_id")
+        ),
+        settings.CATALOG_CACHE_TTL,
+        namespace=EMPLOYEES_NAMESPACE,
+    )
+
+
+class RequestContext:
+    """
+    Данные, которые нужны сериализаторам запроса. Вычисляются один раз
+    и общие для всех экземпляров сериализаторов в рамках запроса.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    @cached_property
+    def client(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        return Client.objects.filter(user=user).first()
+
+    @cached_property
+    def employee_services(self):
+        return get_employee_services()
+
+    def provides(self, employee_id, service_id):
+        return (employee_id, service_id) in self.employee_services
+
+
+def get_request_context(request):
+    context = getattr(request, "_serializer_context", None)
+    if context is None:
+        context = request._serializer_context = RequestContext(request)
+    return context
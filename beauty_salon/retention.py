@@ -0,0 +1,180 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core import serializers
+from django.db import router, transaction
+
+from .cache_utils import (
+    APPOINTMENTS_NAMESPACE,
+    REVIEWS_NAMESPACE,
+    invalidate_namespaces,
+)
+from .models import Appointment, EmployeeDayLock, ReminderLog, Review
+
+logger = logging.getLogger(__name__)
+
+
+def _archive_batch(stream, ids):
+    # JSON Lines: записи и их отзывы, по объекту на строку
+    serializers.serialize(
+        "jsonl", Appointment.objects.filter(pk__in=ids), stream=stream
+    )
+    serializers.serialize(
+        "jsonl", Review.objects.filter(appointment_id__in=ids), stream=stream
+    )
+
+
+def _delete_batch(ids):
+    """
+    Удаляет пачку записей вместе с зависимыми строками прямыми DELETE по
+    первичным ключам: без сбора объектов в память, сигналов и строк
+    истории на каждую запись. Кеш сбрасывается один раз в конце очистки.
+    """
+    using = router.db_for_write(Appointment)
+    for queryset in (
+        ReminderLog.objects.filter(appointment_id__in=ids),
+        Review.objects.filter(appointment_id__in=ids),
+    ):
+        queryset._raw_delete(using)
+    return Appointment.objects.filter(pk__in=ids)._raw_delete(using)
+
+
+def purge_appointments(
+    cutoff, batch_size=None, archive=None, pause=None, progress=None
+):
+    """
+    Удаляет записи, созданные раньше cutoff, пачками по batch_size в
+    порядке первичного ключа. Каждая пачка — отдельная короткая
+    транзакция, между пачками — пауза pause секунд, чтобы не держать
+    блокировки и не мешать рабочей нагрузке.
+
+    archive — открытый текстовый файл: перед удалением пачка дописывается
+    в него в формате JSON Lines. progress(deleted, last_pk) вызывается
+    после каждой пачки. Возвращает число удалённых записей.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+    candidates = Appointment.objects.filter(created_at__lt=cutoff).order_by("pk")
+
+    deleted = 0
+    last_pk = None
+    try:
+        while True:
+            batch = candidates
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            ids = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            last_pk = ids[-1]
+            with transaction.atomic():
+                if archive is not None:
+                    _archive_batch(archive, ids)
+                deleted += _delete_batch(ids)
+            if archive is not None:
+                archive.flush()
+            logger.info("Удалено записей: %s (до id %s)", deleted, last_pk)
+            if progress is not None:
+                progress(deleted, last_pk)
+            if len(ids) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    finally:
+        if deleted:
+            invalidate_namespaces({APPOINTMENTS_NAMESPACE, REVIEWS_NAMESPACE})
+    return deleted
+
+
+def purge_day_locks(before):
+    """
+    Удаляет строки-блокировки дней мастеров (EmployeeDayLock) за даты
+    раньше before: бронирование создаёт по строке на мастера и день,
+    а прошедшие дни больше не бронируются. Возвращает число удалённых.
+    """
+    # Сигналов и зависимых строк нет: один DELETE без выборки
+    return EmployeeDayLock.objects.filter(date__lt=before).delete()[0]
+
+
+def _delete_history(history_ids):
+    # У модели истории нет сигналов и зависимых строк: DELETE без выборки
+    return Appointment.history.filter(history_id__in=history_ids).delete()[0]
+
+
+def compact_appointment_history(horizon, batch_size=None, pause=None):
+    """
+    Сжимает историю записей старше horizon: из изменений ("~") остаются
+    только те, что меняют статус; создание и удаление сохраняются.
+    Обрабатывает по batch_size записей за раз, каждую пачку — в своей
+    транзакции. Возвращает число удалённых снимков.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+    old = Appointment.history.filter(history_date__lt=horizon)
+    candidates = (
+        old.filter(history_type="~").order_by("id").values_list("id", flat=True)
+    )
+
+    removed = 0
+    last_id = None
+    while True:
+        batch = candidates if last_id is None else candidates.filter(id__gt=last_id)
+        object_ids = list(batch.distinct()[:batch_size])
+        if not object_ids:
+            break
+        last_id = object_ids[-1]
+        snapshots = (
+            old.filter(id__in=object_ids)
+            .order_by("id", "history_date", "history_id")
+            .values_list("history_id", "id", "history_type", "status")
+        )
+        redundant = []
+        previous = None
+        for history_id, object_id, history_type, status in snapshots:
+            if (
+                history_type == "~"
+                and previous is not None
+                and previous[0] == object_id
+                and previous[1] == status
+            ):
+                redundant.append(history_id)
+            else:
+                previous = (object_id, status)
+        with transaction.atomic():
+            while redundant:
+                chunk, redundant = redundant[:batch_size], redundant[batch_size:]
+                removed += _delete_history(chunk)
+        logger.info("Сжато снимков истории: %s (до id записи %s)", removed, last_id)
+        if len(object_ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return removed
+
+
+def purge_appointment_history(horizon, batch_size=None, pause=None):
+    """
+    Удаляет снимки истории записей старше horizon пачками по batch_size
+    в порядке history_id. Возвращает число удалённых снимков.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+    candidates = (
+        Appointment.history.filter(history_date__lt=horizon)
+        .order_by("history_id")
+        .values_list("history_id", flat=True)
+    )
+
+    removed = 0
+    while True:
+        history_ids = list(candidates[:batch_size])
+        if not history_ids:
+            break
+        removed += _delete_history(history_ids)
+        logger.info("Удалено снимков истории: %s", removed)
+        if len(history_ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return removed
@@ -1,9 +1,19 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .availability import describe_conflict, find_conflicts
+from .booking import reserve
+from .holds import find_hold_conflicts
 from .models import Appointment, Category, Client, Employee, Product, Review, Service
+from .request_context import get_employee_services, get_request_context
+
+# Сколько записей можно изменить одним запросом bulk_status
+BULK_STATUS_MAX_IDS = 1000
 
 User = get_user_model()
 
@@ -53,7 +63,7 @@ class ClientSerializer(serializers.ModelSerializer):
 class AppointmentSerializer(serializers.ModelSerializer):
     client = serializers.HiddenField(default=serializers.CurrentUserDefault())
     employee = serializers.PrimaryKeyRelatedField(
-        queryset=Employee.objects.none(),
+        queryset=Employee.objects.all(),
         required=True,
     )
     service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.all())
@@ -75,8 +85,6 @@ class AppointmentSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         date = attrs.get("date")
         time = attrs.get("time")
-        service = attrs.get("service")
-        employee = attrs.get("employee")
 
         # Проверка на прошлую дату+время
         if date is not None and time is not None:
@@ -90,37 +98,87 @@ class AppointmentSerializer(serializers.ModelSerializer):
                         "time": "Нельзя записаться на прошедшую дату и время.",
                     }
                 )
-        if service and employee and service not in employee.services.all():
-            raise serializers.ValidationError(
-                {"employee": "Этот исполнитель не предоставляет выбранную услугу."}
-            )
-
-        return super().validate(attrs)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        current = {
+            name: attrs.get(name, getattr(self.instance, name, None))
+            for name in ("employee", "date", "time", "service", "status")
+        }
+        # Связи мастер-услуга — множество из кеша каталога, без запроса к M2M
         request = self.context.get("request")
-        service_id = None
-
-        if request and request.method in ("POST", "PUT", "PATCH"):
-            service_id = request.data.get("service")
-        elif self.instance and getattr(self.instance, "service", None):
-            service_id = self.instance.service.id
+        if current["employee"] is not None and current["service"] is not None:
+            employee_services = (
+                get_request_context(request).employee_services
+                if request
+                else get_employee_services()
+            )
+            if (current["employee"].pk, current["service"].pk) not in employee_services:
+                raise serializers.ValidationError(
+                    {"employee": "Этот исполнитель не предоставляет выбранную услугу."}
+                )
 
-        if service_id:
-            self.fields["employee"].queryset = Employee.objects.filter(
-                services__id=service_id
+        # Пересечение с другими записями мастера с учётом длительности услуги
+        if current["status"] != "canceled" and all(
+            current[name] is not None
+            for name in ("employee", "date", "time", "service")
+        ):
+            # Сначала дешёвая проверка чужих временных броней в Redis
+            if find_hold_conflicts(
+                current["employee"].pk,
+                current["date"],
+                current["time"],
+                current["service"],
+                user_id=request.user.pk if request else None,
+            ):
+                raise serializers.ValidationError(
+                    {"time": "Это время временно забронировано другим клиентом."}
+                )
+            conflicts = find_conflicts(
+                current["employee"].pk,
+                current["date"],
+                current["time"],
+                current["service"],
+                exclude_pk=getattr(self.instance, "pk", None),
             )
+            if conflicts:
+                raise serializers.ValidationError(
+                    {"time": describe_conflict(conflicts)}
+                )
+
+        return super().validate(attrs)
 
     def create(self, validated_data):
-        user = validated_data.pop("client")
-        client = Client.objects.get(user=user)
-        appointment = Appointment.objects.create(client=client, **validated_data)
-        return appointment
+        validated_data.pop("client")
+        client = get_request_context(self.context["request"]).client
+        if client is None:
+            raise serializers.ValidationError("Профиль клиента не найден.")
+        # validate() проверил пересечения без блокировки — повторяем под ней
+        return reserve(
+            validated_data["employee"].pk,
+            validated_data["date"],
+            validated_data["time"],
+            validated_data["service"],
+            partial(Appointment.objects.create, client=client, **validated_data),
+            user_id=self.context["request"].user.pk,
+        )
 
     def update(self, instance, validated_data):
         validated_data.pop("client", None)
-        return super().update(instance, validated_data)
+        write = partial(super().update, instance, validated_data)
+        rescheduled = {"employee", "date", "time", "service"} & set(validated_data)
+        reopened = instance.status == "canceled" and "status" in validated_data
+        if validated_data.get("status", instance.status) == "canceled" or not (
+            rescheduled or reopened
+        ):
+            return write()
+        return reserve(
+            validated_data.get("employee", instance.employee).pk,
+            validated_data.get("date", instance.date),
+            validated_data.get("time", instance.time),
+            validated_data.get("service", instance.service),
+            write,
+            exclude_pk=instance.pk,
+            user_id=self.context["request"].user.pk,
+        )
 
     def get_fields(self):
         fields = super().get_fields()
@@ -133,6 +191,45 @@ class AppointmentSerializer(serializers.ModelSerializer):
         return fields
 
 
+class AvailabilityQuerySerializer(serializers.Serializer):
+    service = serializers.IntegerField(min_value=1)
+    employee = serializers.IntegerField(min_value=1, required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        date_from = attrs.get("date_from") or timezone.localdate()
+        date_to = attrs.get("date_to") or date_from + timezone.timedelta(days=6)
+        if date_to < date_from:
+            raise serializers.ValidationError(
+                {"date_to": "Конец периода раньше его начала."}
+            )
+        if (date_to - date_from).days >= settings.AVAILABILITY_MAX_DAYS:
+            raise serializers.ValidationError(
+                {
+                    "date_to": "Период не может быть длиннее "
+                    f"{settings.AVAILABILITY_MAX_DAYS} дней."
+                }
+            )
+        attrs["date_from"] = date_from
+        attrs["date_to"] = date_to
+        return attrs
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    # Отмену массово не снимаем: см. booking.bulk_set_status
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_STATUS_MAX_IDS,
+    )
+    status = serializers.ChoiceField(
+        choices=[
+            choice for choice in Appointment.STATUS_CHOICES if choice[0] != "pending"
+        ]
+    )
+
+
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
@@ -202,31 +299,23 @@ class ReviewSerializer(serializers.ModelSerializer):
             return obj.client.user.get_full_name() or obj.client.user.username
         return "Аноним"
 
-    # Остальной код сериализатора остается без изменений
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         request = self.context.get("request", None)
 
+        # Фильтр по пользователю без предварительного поиска клиента
         if request and request.user.is_authenticated and not request.user.is_staff:
-            try:
-                client = Client.objects.get(user=request.user)
-                self.fields["appointment"].queryset = (
-                    Appointment.objects.select_related(
-                        "client__user", "employee", "service"
-                    ).filter(client=client, status="completed")
-                )
-            except Client.DoesNotExist:
-                self.fields["appointment"].queryset = Appointment.objects.none()
+            self.fields["appointment"].queryset = Appointment.objects.filter(
+                client__user=request.user, status="completed"
+            )
         else:
-            self.fields["appointment"].queryset = Appointment.objects.select_related(
-                "client__user", "employee"
-            ).all()
+            self.fields["appointment"].queryset = Appointment.objects.all()
 
     def validate_appointment(self, appointment):
         request = self.context.get("request", None)
         if request and request.user and not request.user.is_staff:
-            client = Client.objects.get(user=request.user)
-            if appointment.client != client:
+            client = get_request_context(request).client
+            if client is None or appointment.client_id != client.pk:
                 raise serializers.ValidationError(
                     "Нельзя оставлять отзывы не к своей записи."
                 )
@@ -237,8 +326,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         return appointment
 
     def create(self, validated_data):
-        user = self.context["request"].user
-        validated_data["client"] = user.client
+        validated_data["client"] = get_request_context(self.context["request"]).client
         return super().create(validated_data)
 
 
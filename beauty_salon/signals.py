@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from import_export.signals import post_import
+
+from .cache_utils import (
+    APPOINTMENTS_NAMESPACE,
+    APPOINTMENTS_STAFF_TAG,
+    CATEGORIES_NAMESPACE,
+    EMPLOYEES_NAMESPACE,
+    PRODUCTS_NAMESPACE,
+    REVIEWS_NAMESPACE,
+    SERVICES_NAMESPACE,
+    appointment_user_tag,
+    get_dependent_models,
+    invalidate_model_cache,
+    invalidate_namespaces,
+    register_cache_dependency,
+)
+from .models import Appointment, Category, Client, Employee, Product, Review, Service
+
+User = get_user_model()
+
+register_cache_dependency(Category, CATEGORIES_NAMESPACE)
+# Названия услуг и мастеров выводятся в записях и отзывах
+# Удаление услуги чистит связи с мастерами без m2m_changed
+register_cache_dependency(
+    Service,
+    SERVICES_NAMESPACE,
+    EMPLOYEES_NAMESPACE,
+    APPOINTMENTS_NAMESPACE,
+    REVIEWS_NAMESPACE,
+)
+register_cache_dependency(
+    Employee, EMPLOYEES_NAMESPACE, APPOINTMENTS_NAMESPACE, REVIEWS_NAMESPACE
+)
+register_cache_dependency(Employee.services.through, EMPLOYEES_NAMESPACE)
+register_cache_dependency(Product, PRODUCTS_NAMESPACE)
+register_cache_dependency(Review, REVIEWS_NAMESPACE)
+# Имя клиента выводится на странице отзывов
+register_cache_dependency(Client, REVIEWS_NAMESPACE)
+# Автор отзыва в API — имя пользователя клиента
+register_cache_dependency(User, REVIEWS_NAMESPACE)
+
+# Поля, от которых закешированные данные не зависят: вход пользователя
+# (update_last_login) не должен сбрасывать кеш отзывов
+IGNORED_UPDATE_FIELDS = {"last_login"}
+
+
+def invalidate_on_change(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= IGNORED_UPDATE_FIELDS:
+        return
+    invalidate_model_cache(sender)
+
+
+def invalidate_on_m2m_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_model_cache(sender)
+
+
+def invalidate_appointment_views(sender, instance, created=False, **kwargs):
+    """
+    Сбрасывает кеш записей только у владельца записи и у персонала,
+    а отзывы — только если к записи уже есть отзыв.
+    """
+    if Appointment.client.is_cached(instance):
+        user_id = instance.client.user_id
+    else:
+        user_id = (
+            Client.objects.filter(pk=instance.client_id)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+    namespaces = {APPOINTMENTS_STAFF_TAG, appointment_user_tag(user_id)}
+    if not created and Review.objects.filter(appointment_id=instance.pk).exists():
+        namespaces.add(REVIEWS_NAMESPACE)
+    invalidate_namespaces(namespaces)
+
+
+def invalidate_on_import(sender, model=None, **kwargs):
+    # bulk-импорт (use_bulk) не отправляет post_save, поэтому сбрасываем явно
+    if model is Appointment:
+        invalidate_namespaces({APPOINTMENTS_NAMESPACE, REVIEWS_NAMESPACE})
+    elif model is not None:
+        invalidate_model_cache(model)
+        for field in model._meta.many_to_many:
+            invalidate_model_cache(field.remote_field.through)
+
+
+def connect_cache_invalidation():
+    for model in get_dependent_models():
+        uid = f"cache_invalidation_{model._meta.label_lower}"
+        if model._meta.auto_created:
+            m2m_changed.connect(
+                invalidate_on_m2m_change, sender=model, dispatch_uid=uid
+            )
+        else:
+            post_save.connect(invalidate_on_change, sender=model, dispatch_uid=uid)
+            post_delete.connect(invalidate_on_change, sender=model, dispatch_uid=uid)
+    post_save.connect(
+        invalidate_appointment_views,
+        sender=Appointment,
+        dispatch_uid="cache_invalidation_appointment",
+    )
+    post_delete.connect(
+        invalidate_appointment_views,
+        sender=Appointment,
+        dispatch_uid="cache_invalidation_appointment",
+    )
+    post_import.connect(invalidate_on_import, dispatch_uid="cache_invalidation_import")
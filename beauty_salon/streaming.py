@@ -0,0 +1,56 @@
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def stream_json_array(rows, chunk_size):
+    """
+    Отдаёт JSON-массив строк частями примерно по chunk_size элементов,
+    не собирая весь ответ в памяти.
+    """
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    buffer = ["["]
+    for number, row in enumerate(rows):
+        if number:
+            buffer.append(",")
+        buffer.append(encoder.encode(row))
+        if len(buffer) >= chunk_size * 2:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+    buffer.append("]")
+    yield "".join(buffer).encode("utf-8")
+
+
+class StreamingListMixin:
+    """
+    Добавляет GET {prefix}/export/ — полный список без пагинации, который
+    читается из БД курсором (iterator(chunk_size=...)), сериализуется по
+    одной строке и отдаётся через StreamingHttpResponse. Пиковая память
+    не зависит от числа строк; фильтры и поиск list() действуют и здесь.
+
+    Ответ не кешируется: cache_per_user хранит тело целиком.
+    """
+
+    stream_chunk_size = 500
+    # Сортировка выгрузки — лучше по составному индексу
+    stream_ordering = None
+
+    def get_stream_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.stream_ordering:
+            queryset = queryset.order_by(*self.stream_ordering)
+        return queryset
+
+    @action(detail=False, methods=["get"])
+    def export(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        rows = (
+            serializer.to_representation(instance)
+            for instance in self.get_stream_queryset().iterator(
+                chunk_size=self.stream_chunk_size
+            )
+        )
+        return StreamingHttpResponse(
+            stream_json_array(rows, self.stream_chunk_size),
+            content_type="application/json",
+        )
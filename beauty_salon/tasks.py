@@ -1,43 +1,114 @@
+from pathlib import Path
+from smtplib import SMTPException
+
 from celery import shared_task
-from django.core.mail import send_mail
+from django.conf import settings
 from django.utils import timezone
 
-from .models import Appointment
+from .holds import release_expired_holds
+from .reminders import (
+    iter_pending_batches,
+    plan_reminders,
+    requeue_stale,
+    send_reminders,
+)
+from .retention import (
+    compact_appointment_history,
+    purge_appointment_history,
+    purge_appointments,
+    purge_day_locks,
+)
+
+REMINDER_MAX_RETRIES = 5
+
+
+@shared_task(bind=True)
+def delete_old_appointments(self):
+    """
+    Удаляет записи (Appointment), созданные более APPOINTMENT_RETENTION_DAYS
+    дней назад, пачками (см. retention.purge_appointments). Если задан
+    PURGE_ARCHIVE_DIR, удаляемое сначала сохраняется туда в JSON Lines.
+    Заодно удаляет блокировки прошедших дней мастеров.
+    """
+    cutoff = timezone.now() - timezone.timedelta(
+        days=settings.APPOINTMENT_RETENTION_DAYS
+    )
+
+    def progress(deleted, last_pk):
+        self.update_state(
+            state="PROGRESS", meta={"deleted": deleted, "last_id": last_pk}
+        )
+
+    locks_count = purge_day_locks(timezone.localdate())
+    if not settings.PURGE_ARCHIVE_DIR:
+        deleted_count = purge_appointments(cutoff, progress=progress)
+        return f"Удалено {deleted_count} записей, {locks_count} блокировок дней"
+
+    archive_path = Path(settings.PURGE_ARCHIVE_DIR) / (
+        f"appointments-{timezone.now():%Y%m%d-%H%M%S}.jsonl"
+    )
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(archive_path, "a", encoding="utf-8") as archive:
+        deleted_count = purge_appointments(cutoff, archive=archive, progress=progress)
+    return (
+        f"Удалено {deleted_count} записей, {locks_count} блокировок дней, "
+        f"архив: {archive_path}"
+    )
+
 
 @shared_task
-def delete_old_appointments():
+def trim_appointment_history():
     """
-    Удаляет записи (Appointment), созданные более 1 года назад.
+    Каждую неделю: в истории записей старше HISTORY_COMPACT_DAYS оставляет
+    только смены статуса, старше HISTORY_RETENTION_DAYS — удаляет.
     """
-    cutoff = timezone.now() - timezone.timedelta(days=365)
-    qs = Appointment.objects.filter(created_at__lt=cutoff)
-    deleted_count, _ = qs.delete()
-    return f"Удалено {deleted_count} записей"
+    now = timezone.now()
+    purged = purge_appointment_history(
+        now - timezone.timedelta(days=settings.HISTORY_RETENTION_DAYS)
+    )
+    compacted = compact_appointment_history(
+        now - timezone.timedelta(days=settings.HISTORY_COMPACT_DAYS)
+    )
+    return f"Истории сжато: {compacted}, удалено: {purged}"
+
 
 @shared_task
 def send_appointment_reminders():
     """
-    Каждый день: отправляет письма о записях на завтра.
-    """
-    tomorrow = timezone.now().date() + timezone.timedelta(days=1)
-    appointments = Appointment.objects.filter(date=tomorrow)
-    for appt in appointments:
-        # письмо клиенту
-        send_mail(
-            subject=f"Bellezza Salon: Напоминание о записи на {appt.date} в {appt.time}",
-            message=(
-                f"Здравствуйте {appt.client.name}!\n\n"
-                f"Салон красоты Bellezza напоминает, что вы записаны на услугу:\n"
-                f"• Услуга: {appt.service.name}\n"
-                f"• Мастер: {appt.employee.name}\n"
-                f"• Дата и время: {appt.date} в {appt.time}\n\n"
-                f"Ждем вас в нашем салоне по адресу: [Москва, Большая Якиманка 26]\n"
-                f"Телефон для связи: [+7 917 814 98 41 ]\n\n"
-                f"С уважением,\n"
-                f"Команда салона красоты Bellezza"
-            ),
-            from_email="Bellezza Salon <bellezza@example.com>",
-            recipient_list=[appt.client.email],
-            fail_silently=False,
-        )
-    return f"Отправлено напоминаний: {appointments.count()}"
+    Каждые несколько минут: заносит в журнал напоминания, срок которых
+    наступил (за 24 и за 2 часа до записи), и ставит очередь журнала
+    пачками в send_reminder_batch. Строки, оставшиеся в очереди после
+    сбоя или зависшие в отправке дольше REMINDER_SENDING_LEASE,
+    подхватываются следующим запуском.
+    """
+    requeued = requeue_stale()
+    planned = plan_reminders()
+    batches = 0
+    for batch in iter_pending_batches():
+        send_reminder_batch.delay(batch)
+        batches += 1
+    return (
+        f"Новых напоминаний: {planned}, возвращено в очередь: {requeued}, "
+        f"пачек: {batches}"
+    )
+
+
+@shared_task(
+    autoretry_for=(SMTPException, OSError),
+    retry_backoff=60,
+    max_retries=REMINDER_MAX_RETRIES,
+)
+def send_reminder_batch(log_ids):
+    """
+    Отправляет напоминания одной пачки журнала через одно SMTP-соединение.
+    При ошибке почты пачка повторяется; отправленные строки уже отмечены.
+    """
+    return f"Отправлено напоминаний: {send_reminders(log_ids)}"
+
+
+@shared_task
+def release_expired_slot_holds():
+    """
+    Каждую минуту: убирает истёкшие временные брони из индексов Redis.
+    """
+    return f"Снято броней: {release_expired_holds()}"
@@ -1,3 +1,588 @@
-# from django.test import TestCase
+import random
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+from itertools import islice
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.filters import OrderingFilter
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import local_cache
+from .availability import BusyIndex, get_span, to_minutes
+from .booking import BookingConflict, reserve
+from .models import (
+    Appointment,
+    Category,
+    Client,
+    Employee,
+    Product,
+    ReminderLog,
+    Review,
+    Service,
+)
+from .reminders import plan_reminders, requeue_stale, send_reminders
+from .views import ProductViewSet
+
+# Тестам не нужен Redis: поколения кеша и блокировки живут в памяти
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+# Без кеша: считаются запросы к БД, а не попадания в кеш
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def reset_caches():
+    cache.clear()
+    local_cache.values.clear()
+    local_cache.forget_all_generations()
+
+
+def make_catalog(duration=60):
+    service = Service.objects.create(name="Стрижка", price=1000, duration=duration)
+    employee = Employee.objects.create(name="Анна", position="Стилист")
+    employee.services.add(service)
+    return service, employee
+
+
+def make_client(number=1, user=None):
+    return Client.objects.create(
+        user=user,
+        name=f"Клиент {number}",
+        email=f"client{number}@example.com",
+        phone=f"+7900000{number:04d}",
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BookingConcurrencyTests(TransactionTestCase):
+    """
+    Одновременные бронирования к одному мастеру не должны давать
+    пересекающихся записей (см. booking.reserve). Проверяется блокировка
+    настроенной БД: на SQLite — запись в строку дня, на PostgreSQL —
+    SELECT ... FOR UPDATE NOWAIT.
+    """
+
+    bookings = 300
+    threads = 10
+
+    def setUp(self):
+        self.service, self.employee = make_catalog()
+        self.client_record = make_client()
+
+    def book(self, day, start):
+        return reserve(
+            self.employee.pk,
+            day,
+            start,
+            self.service,
+            lambda: Appointment.objects.create(
+                client=self.client_record,
+                employee=self.employee,
+                service=self.service,
+                date=day,
+                time=start,
+            ),
+        )
+
+    def test_concurrent_bookings_do_not_overlap(self):
+        day = timezone.localdate() + timedelta(days=30)
+        opening = to_minutes(settings.SALON_OPENING_TIME)
+        closing = to_minutes(settings.SALON_CLOSING_TIME)
+        starts = range(
+            opening,
+            closing - self.service.duration + 1,
+            settings.APPOINTMENT_SLOT_MINUTES,
+        )
+        minutes = random.Random(0).choices(starts, k=self.bookings)
+        results = Counter()
+        errors = []
+        results_lock = threading.Lock()
+        barrier = threading.Barrier(self.threads)
+
+        def worker(chunk):
+            barrier.wait()
+            try:
+                for value in chunk:
+                    start = time(value // 60, value % 60)
+                    try:
+                        self.book(day, start)
+                        outcome = "created"
+                    except BookingConflict:
+                        outcome = "conflicts"
+                    except Exception as error:
+                        errors.append(error)
+                        outcome = "errors"
+                    with results_lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(
+                target=worker, args=(list(islice(minutes, number, None, self.threads)),)
+            )
+            for number in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(results.values()), self.bookings)
+        # Слотов в дне меньше, чем попыток: часть обязана получить отказ
+        self.assertGreater(results["conflicts"], 0)
+        booked = sorted(
+            Appointment.objects.filter(employee=self.employee, date=day).values_list(
+                "time", "service__duration", "service__buffer"
+            )
+        )
+        self.assertEqual(len(booked), results["created"])
+        index = BusyIndex()
+        for start, duration, buffer in booked:
+            begin, end = get_span(start, duration, buffer)
+            self.assertTrue(
+                index.is_free(self.employee.pk, day, begin, end),
+                f"Пересечение в {start}",
+            )
+            index.add(self.employee.pk, day, begin, end)
+
+
+# Сессии по умолчанию в кеше, а он отключён — держим их в cookie
+@override_settings(
+    CACHES=NO_CACHE,
+    SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+)
+class QueryCountTests(TestCase):
+    """
+    Число SQL-запросов API и страниц сайта не должно зависеть от числа
+    строк: каждый эндпоинт измеряется на малых данных, затем строки
+    добавляются и число запросов должно остаться тем же.
+    """
+
+    client_class = APIClient
+    few_rows = 2
+    many_rows = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pairs = []
+        for number in range(3):
+            service = Service.objects.create(
+                name=f"Услуга {number}", price=1000, duration=60
+            )
+            employee = Employee.objects.create(
+                name=f"Мастер {number}", position="Стилист"
+            )
+            employee.services.add(service)
+            cls.pairs.append((employee, service))
+        cls.client_record = make_client(user=User.objects.create_user("client"))
+        cls.staff = User.objects.create_user("staff", is_staff=True)
+
+    def add_rows(self, rows):
+        today = timezone.localdate()
+        appointments = Appointment.objects.bulk_create(
+            Appointment(
+                client=self.client_record,
+                employee=employee,
+                service=service,
+                date=today,
+                time=time(0, 0),
+                # Ожидающие попадают в urgent, завершённые — в отзывы
+                status=("pending", "completed")[number % 2],
+            )
+            for number, (employee, service) in enumerate(
+                random.Random(rows).choices(self.pairs, k=rows)
+            )
+        )
+        # Отзыв можно оставить только о завершённой записи
+        Review.objects.bulk_create(
+            Review(
+                appointment=appointment,
+                client=self.client_record,
+                rating=5,
+                comment="",
+            )
+            for appointment in appointments
+            if appointment.status == "completed"
+        )
+
+    def get(self, url):
+        # Кеш каталога в памяти процесса тоже не должен отвечать за БД
+        local_cache.values.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+    def assertQueriesStable(self, url, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        # Несколько строк есть всегда: пустая страница дешевле
+        self.add_rows(self.few_rows)
+        with CaptureQueriesContext(connection) as queries:
+            self.get(url)
+        self.add_rows(self.many_rows)
+        with self.assertNumQueries(len(queries)):
+            self.get(url)
+
+    def test_client_appointments(self):
+        self.assertQueriesStable("/api/v1/appointments/", self.client_record.user)
+
+    def test_staff_appointments(self):
+        self.assertQueriesStable("/api/v1/appointments/", self.staff)
+
+    def test_urgent_appointments(self):
+        self.assertQueriesStable("/api/v1/appointments/urgent/", self.staff)
+
+    def test_reviews(self):
+        self.assertQueriesStable("/api/v1/reviews/")
+
+    def test_high_rating_reviews(self):
+        self.assertQueriesStable("/api/v1/reviews/high_rating/")
+
+    def test_my_reviews(self):
+        self.assertQueriesStable("/api/v1/my-reviews/", self.client_record.user)
+
+    def test_profile_page(self):
+        self.assertQueriesStable("/beauty_salon/profile/", self.client_record.user)
+
+    def test_reviews_page(self):
+        self.assertQueriesStable("/beauty_salon/reviews/")
+
+    def test_employees_page(self):
+        self.assertQueriesStable("/beauty_salon/employees/")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReminderTests(TestCase):
+    """Журнал напоминаний: перенос записи и строки, зависшие в отправке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service, cls.employee = make_catalog()
+        cls.client_record = make_client()
+
+    def setUp(self):
+        # Запись через 20 часов — в окне напоминания за сутки
+        self.now = timezone.make_aware(
+            datetime.combine(timezone.localdate() + timedelta(days=10), time(8, 0))
+        )
+        start = timezone.localtime(self.now + timedelta(hours=20))
+        self.appointment = Appointment.objects.create(
+            client=self.client_record,
+            employee=self.employee,
+            service=self.service,
+            date=start.date(),
+            time=start.time(),
+        )
+
+    def send_all(self):
+        ids = list(ReminderLog.objects.values_list("pk", flat=True))
+        return send_reminders(ids)
+
+    def test_rescheduled_appointment_is_reminded_again(self):
+        self.assertEqual(plan_reminders(self.now), 1)
+        self.assertEqual(plan_reminders(self.now), 0)
+        self.assertEqual(self.send_all(), 1)
+
+        self.appointment.time = time(5, 0)
+        self.appointment.save()
+        self.assertEqual(plan_reminders(self.now), 1)
+        self.assertEqual(self.send_all(), 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_plan_counts_only_inserted_rows(self):
+        self.assertEqual(plan_reminders(self.now), 1)
+        # Как если бы строку занёс параллельный запуск уже после проверки
+        with mock.patch("beauty_salon.reminders.Exists", return_value=Q(pk__in=[])):
+            self.assertEqual(plan_reminders(self.now), 0)
+        self.assertEqual(ReminderLog.objects.count(), 1)
+
+    def test_reminder_planned_before_reschedule_is_skipped(self):
+        plan_reminders(self.now)
+        self.appointment.time = time(5, 0)
+        self.appointment.save()
+
+        self.assertEqual(self.send_all(), 0)
+        self.assertEqual(ReminderLog.objects.get().status, "skipped")
+
+    @override_settings(REMINDER_SENDING_LEASE=60)
+    def test_stale_sending_rows_are_requeued(self):
+        plan_reminders(self.now)
+        claimed_at = timezone.now()
+        ReminderLog.objects.update(status="sending", sent_at=claimed_at)
+
+        self.assertEqual(requeue_stale(claimed_at + timedelta(seconds=30)), 0)
+        self.assertEqual(requeue_stale(claimed_at + timedelta(seconds=90)), 1)
+        log = ReminderLog.objects.get()
+        self.assertEqual((log.status, log.sent_at), ("pending", None))
+
+
+class OrderedProductViewSet(ProductViewSet):
+    # В API сортировка каталога не включена — проверяем её на наследнике
+    filter_backends = [*ProductViewSet.filter_backends, OrderingFilter]
+    ordering_fields = ["name", "price"]
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CachedCollectionTests(TestCase):
+    """
+    Списки каталога из снимка (CachedCollectionMixin): после прогрева
+    фильтры, поиск, сортировка и страницы обходятся без запросов к БД,
+    а то, что снимок не обслуживает, уходит в SQL с тем же результатом.
+    """
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hair = Category.objects.create(name="Волосы")
+        cls.nails = Category.objects.create(name="Ногти")
+        cls.products = [
+            Product.objects.create(
+                category=(cls.hair, cls.nails)[number % 2],
+                name=f"{('Шампунь', 'Лак')[number % 2]} {number:02d}",
+                price=100 + number,
+            )
+            for number in range(20)
+        ]
+
+    def setUp(self):
+        reset_caches()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.data
+
+    def assertServedFromCache(self, url):
+        # Первый запрос строит снимок, повторный — только из кеша
+        expected = self.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(url), expected)
+        return expected
+
+    def assertServedFromDatabase(self, url):
+        self.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get(url)
+        self.assertTrue(queries, url)
+        return data
+
+    def names(self, data):
+        return [item["name"] for item in data["results"]]
+
+    def test_filter(self):
+        data = self.assertServedFromCache(f"/api/v1/products/?category={self.nails.pk}")
+        self.assertEqual(data["count"], 10)
+        self.assertTrue(all(name.startswith("Лак") for name in self.names(data)))
+
+    def test_invalid_filter_is_rejected(self):
+        for value in ("999", "abc"):
+            response = self.client.get(f"/api/v1/products/?category={value}")
+            self.assertEqual(response.status_code, 400, value)
+
+    def test_search(self):
+        data = self.assertServedFromCache("/api/v1/products/?search=шампунь")
+        self.assertEqual(data["count"], 10)
+
+    def test_page(self):
+        data = self.assertServedFromCache("/api/v1/products/?page=2")
+        self.assertEqual(
+            self.names(data), [product.name for product in self.products[15:]]
+        )
+
+    def test_ordering(self):
+        view = OrderedProductViewSet.as_view({"get": "list"})
+        factory = APIRequestFactory()
+
+        def get():
+            response = view(factory.get("/api/v1/products/", {"ordering": "-price"}))
+            self.assertEqual(response.status_code, 200)
+            return response.data
+
+        expected = get()
+        with self.assertNumQueries(0):
+            self.assertEqual(get(), expected)
+        self.assertEqual(
+            self.names(expected),
+            [product.name for product in reversed(self.products)][:15],
+        )
+
+    def test_repeated_param_uses_database(self):
+        data = self.assertServedFromDatabase(
+            f"/api/v1/products/?category={self.hair.pk}&category={self.nails.pk}"
+        )
+        sql = Product.objects.filter(category=self.nails).count()
+        self.assertEqual(data["count"], sql)
+
+    def test_unknown_param_uses_database(self):
+        data = self.assertServedFromDatabase("/api/v1/products/?name=Лак")
+        self.assertEqual(data["count"], 20)
+
+
+class BusyIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = BusyIndex()
+        self.day = datetime(2030, 1, 1).date()
+
+    def test_overlapping_and_adjacent_intervals_merge(self):
+        for start, end in ((600, 660), (640, 700), (700, 720), (800, 830)):
+            self.index.add(1, self.day, start, end)
+        self.assertEqual(self.index._get_day(1, self.day), ([600, 800], [720, 830]))
+
+    def test_is_free(self):
+        self.index.add(1, self.day, 600, 660)
+        self.index.add(1, self.day, 720, 780)
+        self.assertTrue(self.index.is_free(1, self.day, 540, 600))
+        self.assertTrue(self.index.is_free(1, self.day, 660, 720))
+        self.assertFalse(self.index.is_free(1, self.day, 650, 730))
+        self.assertFalse(self.index.is_free(1, self.day, 610, 620))
+        # Другой мастер и другой день не затронуты
+        self.assertTrue(self.index.is_free(2, self.day, 600, 660))
+        self.assertTrue(self.index.is_free(1, self.day + timedelta(days=1), 600, 660))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AvailabilityTests(TestCase):
+    """Свободные слоты: GET /api/v1/availability/."""
+
+    client_class = APIClient
+    url = "/api/v1/availability/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service, cls.employee = make_catalog()
+        cls.day = timezone.localdate() + timedelta(days=7)
+
+    def setUp(self):
+        reset_caches()
+
+    def get_slots(self, **params):
+        params = {"service": self.service.pk, "date_from": self.day, **params}
+        params.setdefault("date_to", params["date_from"])
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        [day] = response.data
+        return day["slots"]
+
+    def test_without_holds(self):
+        slots = self.get_slots()
+        self.assertEqual(slots[0], "09:00")
+        self.assertEqual(slots[-1], "20:00")
+
+    def test_held_slots_are_hidden(self):
+        held = {(self.employee.pk, self.day): [(to_minutes(time(12, 0)), 13 * 60)]}
+        with mock.patch("beauty_salon.holds.get_held_spans", return_value=held):
+            slots = self.get_slots()
+        self.assertNotIn("11:30", slots)
+        self.assertNotIn("12:30", slots)
+        self.assertIn("11:00", slots)
+        self.assertIn("13:00", slots)
+
+    def test_booked_interval_with_buffer_is_busy(self):
+        booked = Service.objects.create(
+            name="Окрашивание", price=3000, duration=60, buffer=15
+        )
+        Appointment.objects.create(
+            client=make_client(),
+            employee=self.employee,
+            service=booked,
+            date=self.day,
+            time=time(10, 0),
+        )
+        slots = self.get_slots()
+        # Занято 10:00–11:15: часовая услуга не помещается с 9:30 по 11:00
+        self.assertIn("09:00", slots)
+        self.assertNotIn("09:30", slots)
+        self.assertNotIn("11:00", slots)
+        self.assertIn("11:30", slots)
+
+    def test_canceled_appointment_frees_slot(self):
+        Appointment.objects.create(
+            client=make_client(),
+            employee=self.employee,
+            service=self.service,
+            date=self.day,
+            time=time(10, 0),
+            status="canceled",
+        )
+        self.assertIn("10:00", self.get_slots())
+
+    def test_service_duration_fits_before_closing(self):
+        long = Service.objects.create(name="Уход", price=2000, duration=90)
+        self.employee.services.add(long)
+        slots = self.get_slots(service=long.pk)
+        self.assertEqual(slots[-1], "19:30")
+
+    def test_today_starts_after_current_time(self):
+        today = timezone.localdate()
+        now = timezone.make_aware(datetime.combine(today, time(14, 10)))
+        with mock.patch.object(timezone, "localtime", return_value=now):
+            slots = self.get_slots(date_from=today)
+        self.assertEqual(slots[0], "14:30")
+
+    def test_past_day_has_no_slots(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(self.get_slots(date_from=yesterday), [])
+
+    def test_unknown_service_has_no_slots(self):
+        response = self.client.get(self.url, {"service": 999})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
+
+    def test_invalid_params(self):
+        day = self.day.isoformat()
+        later = (self.day + timedelta(days=30)).isoformat()
+        earlier = (self.day - timedelta(days=1)).isoformat()
+        for params in (
+            {},
+            {"service": "abc"},
+            {"service": self.service.pk, "date_from": "завтра"},
+            {"service": self.service.pk, "date_from": day, "date_to": earlier},
+            {"service": self.service.pk, "date_from": day, "date_to": later},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AnonymousPageCacheTests(TestCase):
+    """Страницы каталога для анонимов: в ключ кеша идёт только номер страницы."""
+
+    url = "/beauty_salon/employees/"
+
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog()
+
+    def setUp(self):
+        reset_caches()
+
+    def count_queries(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"{self.url}{query}")
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_page_number_is_cached(self):
+        for query in ("", "?page=2"):
+            self.count_queries(query)
+            self.assertEqual(self.count_queries(query), 0, query)
+
+    def test_other_params_are_not_cached(self):
+        for query in ("?utm_source=x", "?page=1&page=2", "?page=02", "?page=999"):
+            self.count_queries(query)
+            self.assertGreater(self.count_queries(query), 0, query)
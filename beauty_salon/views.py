@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LogoutView
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Q
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
 
 # DRF imports
 from rest_framework import filters
@@ -11,7 +14,7 @@ from rest_framework import permissions
 from rest_framework import permissions as drf_permissions
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.routers import DefaultRouter
@@ -20,15 +23,42 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 
 # Cache imports
 from django.core.cache import cache
-from .cache_utils import get_cached_data
-from .decorators import cache_per_user
+from .cache_utils import (
+    APPOINTMENTS_NAMESPACE,
+    APPOINTMENTS_STAFF_TAG,
+    CATEGORIES_CACHE_KEY,
+    CATEGORIES_NAMESPACE,
+    EMPLOYEES_CACHE_KEY,
+    EMPLOYEES_NAMESPACE,
+    PRODUCTS_CACHE_KEY,
+    PRODUCTS_NAMESPACE,
+    REVIEWS_NAMESPACE,
+    SERVICES_CACHE_KEY,
+    SERVICES_NAMESPACE,
+    appointment_user_tag,
+)
+from .cached_collections import CachedCollectionMixin
+from .decorators import (
+    cache_page_for_anonymous,
+    cache_per_user,
+    cache_public,
+    conditional_get,
+)
 from django.utils.decorators import method_decorator
 
+from .availability import get_available_slots
+from .booking import BookingConflict, bulk_set_status, save_booked
 from .forms import AppointmentForm, ClientRegistrationForm, ReviewForm
+from .holds import get_hold, place_hold, release_hold
 from .models import Appointment, Category, Client, Employee, Product, Review, Service
+from .pagination import KeysetPagination, ReviewPagination
 from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin
+from .projections import ProjectionMixin
+from .request_context import get_request_context
 from .serializers import (
     AppointmentSerializer,
+    AvailabilityQuerySerializer,
+    BulkStatusSerializer,
     CategorySerializer,
     ClientSerializer,
     EmailTokenObtainPairSerializer,
@@ -39,29 +69,60 @@ from .serializers import (
     ServiceSerializer,
     UserSerializer,
 )
+from .streaming import StreamingListMixin
+
+# Размеры страниц HTML-разделов сайта
+EMPLOYEES_PER_PAGE = 12
+REVIEWS_PER_PAGE = 10
+PROFILE_APPOINTMENTS_PER_PAGE = 10
 
 
 def home(request):
     return render(request, "home.html")
 
 
+@cache_page_for_anonymous(
+    settings.CATALOG_CACHE_TTL, (CATEGORIES_NAMESPACE, SERVICES_NAMESPACE)
+)
 def service_list(request):
     categories = Category.objects.prefetch_related("services").all()
     return render(request, "service_list.html", {"categories": categories})
 
 
+@cache_page_for_anonymous(
+    settings.CATALOG_CACHE_TTL,
+    (SERVICES_NAMESPACE, CATEGORIES_NAMESPACE, EMPLOYEES_NAMESPACE),
+)
 def service_detail(request, service_id):
-    service = get_object_or_404(Service, id=service_id)
+    service = get_object_or_404(
+        Service.objects.select_related("category").prefetch_related(
+            Prefetch("employees", queryset=Employee.objects.order_by("name"))
+        ),
+        id=service_id,
+    )
     return render(request, "service_detail.html", {"service": service})
 
 
+@cache_page_for_anonymous(settings.CATALOG_CACHE_TTL, (EMPLOYEES_NAMESPACE,))
 def employee_list(request):
-    employees = Employee.objects.all()
-    return render(request, "employee_list.html", {"employees": employees})
+    page_obj = Paginator(
+        Employee.objects.order_by("name", "id"), EMPLOYEES_PER_PAGE
+    ).get_page(request.GET.get("page"))
+    return render(
+        request, "employee_list.html", {"employees": page_obj, "page_obj": page_obj}
+    )
 
 
+@cache_page_for_anonymous(
+    settings.CATALOG_CACHE_TTL, (EMPLOYEES_NAMESPACE, SERVICES_NAMESPACE)
+)
 def employee_detail(request, employee_id):
-    employee = get_object_or_404(Employee, id=employee_id)
+    employee = get_object_or_404(
+        Employee.objects.prefetch_related(
+            Prefetch("services", queryset=Service.objects.order_by("name"))
+        ),
+        id=employee_id,
+    )
     return render(request, "employee_detail.html", {"employee": employee})
 
 
@@ -75,9 +136,24 @@ def product_list(request):
     return render(request, "product_list.html", {"products": products})
 
 
+@cache_page_for_anonymous(60 * 60, (REVIEWS_NAMESPACE,))
 def review_list(request):
-    reviews = Review.objects.all()
-    return render(request, "review_list.html", {"reviews": reviews})
+    reviews = (
+        Review.objects.select_related("client", "appointment__employee")
+        .only(
+            "rating",
+            "comment",
+            "client__name",
+            "appointment__date",
+            "appointment__time",
+            "appointment__employee__name",
+        )
+        .order_by("-id")
+    )
+    page_obj = Paginator(reviews, REVIEWS_PER_PAGE).get_page(request.GET.get("page"))
+    return render(
+        request, "review_list.html", {"reviews": page_obj, "page_obj": page_obj}
+    )
 
 
 def register(request):
@@ -107,13 +183,29 @@ def profile(request):
             {"message": "У вас нет профиля клиента, поэтому нет записей."},
         )
 
-    appointments = Appointment.objects.filter(client=client).order_by("-date", "-time")
-
-    for app in appointments:
-        app.existing_review = Review.objects.filter(appointment=app).first()
+    # Мастер, услуга и отзывы страницы — тремя запросами при любом числе записей
+    appointments = (
+        Appointment.objects.filter(client=client)
+        .select_related("employee", "service")
+        .prefetch_related(
+            Prefetch(
+                "review_set",
+                queryset=Review.objects.only("id", "appointment"),
+                to_attr="reviews",
+            )
+        )
+        .order_by("-date", "-time", "-id")
+    )
+    page_obj = Paginator(appointments, PROFILE_APPOINTMENTS_PER_PAGE).get_page(
+        request.GET.get("page")
+    )
+    for app in page_obj:
+        app.existing_review = app.reviews[0] if app.reviews else None
 
     return render(
-        request, "profile.html", {"client": client, "appointments": appointments}
+        request,
+        "profile.html",
+        {"client": client, "appointments": page_obj, "page_obj": page_obj},
     )
 
 
@@ -124,9 +216,13 @@ def appointment_create(request):
         if form.is_valid():
             appointment = form.save(commit=False)
             appointment.client = request.user.client
-            appointment.save()
-            form.save_m2m()
-            return redirect("profile")
+            try:
+                save_booked(appointment, user_id=request.user.pk)
+            except BookingConflict as exc:
+                form.add_error(None, exc.detail)
+            else:
+                form.save_m2m()
+                return redirect("profile")
     else:
         form = AppointmentForm(user=request.user)
 
@@ -164,8 +260,12 @@ def appointment_edit(request, appointment_id):
     if request.method == "POST":
         form = AppointmentForm(request.POST, instance=appointment, user=request.user)
         if form.is_valid():
-            form.save()
-            return redirect("profile")
+            try:
+                save_booked(form.save(commit=False), user_id=request.user.pk)
+            except BookingConflict as exc:
+                form.add_error(None, exc.detail)
+            else:
+                return redirect("profile")
     else:
         form = AppointmentForm(instance=appointment, user=request.user)
 
@@ -244,12 +344,17 @@ def edit_review(request, review_id):
 # ================== Классы для DRF API ==================
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()
+@method_decorator(conditional_get(CATEGORIES_NAMESPACE), name="list")
+@method_decorator(conditional_get(CATEGORIES_NAMESPACE), name="retrieve")
+class CategoryViewSet(CachedCollectionMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.order_by("id")
     serializer_class = CategorySerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ["name"]
     permission_classes = [IsAdminOrReadOnly]
+    collection_cache_key = CATEGORIES_CACHE_KEY
+    collection_namespace = CATEGORIES_NAMESPACE
+    collection_absolute_url_fields = ("image_url",)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -259,73 +364,130 @@ class CategoryViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Category.objects.none()
-
-        cache_key = "categories_all"
-        return get_cached_data(cache_key, lambda: Category.objects.all(), 60 * 60)
+        return super().get_queryset()
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
-    queryset = Service.objects.all()
+@method_decorator(conditional_get(SERVICES_NAMESPACE), name="list")
+@method_decorator(conditional_get(SERVICES_NAMESPACE), name="retrieve")
+class ServiceViewSet(CachedCollectionMixin, viewsets.ModelViewSet):
+    queryset = Service.objects.order_by("id")
     serializer_class = ServiceSerializer
     filterset_fields = ["category", "price"]
     search_fields = ["name", "description"]
     permission_classes = [IsAdminOrReadOnly]
     pagination_class = None
+    collection_cache_key = SERVICES_CACHE_KEY
+    collection_namespace = SERVICES_NAMESPACE
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Service.objects.none()
-
-        cache_key = "services_all"
-        return get_cached_data(
-            cache_key, lambda: Service.objects.all(), 60 * 30  # 30 минут для услуг
-        )
+        return super().get_queryset()
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
-    queryset = Employee.objects.all()
+@method_decorator(conditional_get(EMPLOYEES_NAMESPACE), name="list")
+@method_decorator(conditional_get(EMPLOYEES_NAMESPACE), name="retrieve")
+class EmployeeViewSet(CachedCollectionMixin, viewsets.ModelViewSet):
+    queryset = Employee.objects.prefetch_related("services").order_by("id")
     serializer_class = EmployeeSerializer
     search_fields = ["name", "position"]
     filterset_fields = ["position", "services"]
     permission_classes = [IsAdminOrReadOnly]
     pagination_class = None
+    collection_cache_key = EMPLOYEES_CACHE_KEY
+    collection_namespace = EMPLOYEES_NAMESPACE
+    collection_absolute_url_fields = ("photo",)
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Employee.objects.none()
-
-        cache_key = "employees_all"
-        return get_cached_data(cache_key, lambda: Employee.objects.all(), 60 * 30)
+        return super().get_queryset()
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+@method_decorator(conditional_get(PRODUCTS_NAMESPACE), name="list")
+@method_decorator(conditional_get(PRODUCTS_NAMESPACE), name="retrieve")
+class ProductViewSet(CachedCollectionMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.order_by("id")
     serializer_class = ProductSerializer
     filterset_fields = ["category", "price"]
     search_fields = ["name"]
     permission_classes = [IsAdminOrReadOnly]
+    collection_cache_key = PRODUCTS_CACHE_KEY
+    collection_namespace = PRODUCTS_NAMESPACE
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Product.objects.none()
-
-        cache_key = "products_all"
-        return get_cached_data(
-            cache_key, lambda: Product.objects.all(), 60 * 30  # 30 минут для продуктов
-        )
+        return super().get_queryset()
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all()
+    stream_ordering = ("id",)
     serializer_class = ClientSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ["name", "email"]
     permission_classes = [IsAdminUser]
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class SlotHoldViewSet(viewsets.ViewSet):
+    """
+    Временные брони слотов: POST — занять слот на SLOT_HOLD_TIMEOUT секунд,
+    POST {id}/confirm/ — превратить бронь в запись, DELETE — отпустить.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_hold_or_404(self, pk):
+        hold = get_hold(pk, self.request.user.pk)
+        if hold is None:
+            raise NotFound("Бронь не найдена или истекла.")
+        return hold
+
+    def create(self, request):
+        serializer = AppointmentSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        hold = place_hold(
+            request.user.pk,
+            data["employee"].pk,
+            data["service"],
+            data["date"],
+            data["time"],
+        )
+        return Response(hold, status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, pk=None):
+        release_hold(self.get_hold_or_404(pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"])
+    def confirm(self, request, pk=None):
+        hold = self.get_hold_or_404(pk)
+        serializer = AppointmentSerializer(
+            data={name: hold[name] for name in ("employee", "service", "date", "time")},
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        release_hold(hold)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+def appointment_cache_tags(request):
+    # Персонал видит все записи, клиент — только свои
+    if request.user.is_staff:
+        return [APPOINTMENTS_STAFF_TAG]
+    return [appointment_user_tag(request.user.id)]
+
+
+class AppointmentViewSet(StreamingListMixin, ProjectionMixin, viewsets.ModelViewSet):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
+    pagination_class = KeysetPagination
+    stream_ordering = KeysetPagination.ordering
     filterset_fields = ["status", "service", "employee"]
     search_fields = ["client__name", "service__name"]
     permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
@@ -354,7 +516,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(
                 Q(date=date) & Q(service__id=service) & ~Q(status="canceled")
             )
-        return queryset
+        return self.project(queryset)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -375,14 +537,38 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         return {"request": self.request}
 
     @action(detail=False, methods=["get"])
+    @method_decorator(
+        conditional_get(
+            APPOINTMENTS_NAMESPACE,
+            tags=appointment_cache_tags,
+            vary_on=lambda request: timezone.now().date().isoformat(),
+            last_modified=False,
+        )
+    )
     def urgent(self, request):
-        from django.utils import timezone
-
-        queryset = self.get_queryset().filter(
+        queryset = self.filter_queryset(self.get_queryset()).filter(
             Q(date=timezone.now().date()) & Q(status="pending")
         )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAdminUser],
+        url_path="bulk-status",
+        serializer_class=BulkStatusSerializer,
+    )
+    def bulk_status(self, request):
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = bulk_set_status(
+            Appointment.objects.filter(pk__in=serializer.validated_data["ids"]),
+            serializer.validated_data["status"],
+            user=request.user,
+        )
+        return Response({"updated": updated})
 
     @action(detail=True, methods=["post"], permission_classes=[IsAdminUser])
     def confirm(self, request, pk=None):
@@ -391,45 +577,62 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         appointment.save()
         return Response({"status": "confirmed"})
 
-    @method_decorator(cache_per_user(60 * 5))
+    @method_decorator(
+        conditional_get(APPOINTMENTS_NAMESPACE, tags=appointment_cache_tags)
+    )
+    @method_decorator(
+        cache_per_user(
+            60 * 60, namespace=APPOINTMENTS_NAMESPACE, tags=appointment_cache_tags
+        )
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-    @method_decorator(cache_per_user(60 * 5))
+    @method_decorator(
+        conditional_get(APPOINTMENTS_NAMESPACE, tags=appointment_cache_tags)
+    )
+    @method_decorator(
+        cache_per_user(
+            60 * 60, namespace=APPOINTMENTS_NAMESPACE, tags=appointment_cache_tags
+        )
+    )
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
 
-@method_decorator(cache_per_user(60 * 15), name="list")
-@method_decorator(cache_per_user(60 * 15), name="retrieve")
-class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.select_related(
-        "appointment",
-        "appointment__employee",
-        "appointment__service",
-        "client",
-        "client__user",
-    ).all()
+@method_decorator(conditional_get(REVIEWS_NAMESPACE), name="list")
+@method_decorator(conditional_get(REVIEWS_NAMESPACE), name="retrieve")
+# Отзывы читают все (AllowAny), и ответ не зависит от пользователя —
+# одна запись кеша на страницу вместо копии на каждого посетителя
+@method_decorator(cache_public(60 * 60, namespace=REVIEWS_NAMESPACE), name="list")
+@method_decorator(cache_public(60 * 60, namespace=REVIEWS_NAMESPACE), name="retrieve")
+class ReviewViewSet(ProjectionMixin, viewsets.ModelViewSet):
+    queryset = Review.objects.all()
     serializer_class = ReviewSerializer
-    pagination_class = None
+    pagination_class = ReviewPagination
+    # author читает пользователя клиента
+    projection_extra = ("client__user",)
 
     def get_queryset(self):
-        return super().get_queryset()
+        return self.project(super().get_queryset())
 
     @action(detail=False, methods=["get"])
+    @method_decorator(conditional_get(REVIEWS_NAMESPACE))
+    @method_decorator(cache_public(60 * 60, namespace=REVIEWS_NAMESPACE))
     def high_rating(self, request):
         queryset = self.get_queryset().filter(rating__gte=4)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def perform_create(self, serializer):
-        client = self.request.user.client
+        client = get_request_context(self.request).client
         appointment = serializer.validated_data.get("appointment")
 
         if appointment.status != "completed":
             raise ValidationError("Приём не завершён.")
 
-        if appointment.client != client:
+        if client is None or appointment.client_id != client.pk:
             raise PermissionDenied("Вы не можете оставить отзыв к чужой записи.")
 
         serializer.save(client=client)
@@ -445,18 +648,15 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated(), IsOwnerOrAdmin()]
 
 
-class UserReviewViewSet(viewsets.ReadOnlyModelViewSet):
+class UserReviewViewSet(ProjectionMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
+    projection_extra = ("client__user",)
 
     def get_queryset(self):
-        return Review.objects.select_related(
-            "appointment",
-            "appointment__employee",
-            "appointment__service",
-            "client",
-            "client__user",
-        ).filter(client__user=self.request.user)
+        return self.project(
+            Review.objects.filter(client__user=self.request.user).order_by("-id")
+        )
 
 
 # ================== Доп. API View ==================
@@ -468,6 +668,28 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 
+class AvailabilityView(APIView):
+    """
+    Свободные времена записи на услугу:
+    ?service=<id>&date_from=&date_to=&employee=<id>
+    """
+
+    permission_classes = [drf_permissions.AllowAny]
+
+    def get(self, request):
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        return Response(
+            get_available_slots(
+                data["service"],
+                data["date_from"],
+                data["date_to"],
+                employee_id=data.get("employee"),
+            )
+        )
+
+
 class RegisterAPIView(APIView):
     permission_classes = [drf_permissions.AllowAny]
 
@@ -492,6 +714,7 @@ router.register(r"services", ServiceViewSet)
 router.register(r"employees", EmployeeViewSet)
 router.register(r"clients", ClientViewSet)
 router.register(r"appointments", AppointmentViewSet)
+router.register(r"holds", SlotHoldViewSet, basename="hold")
 router.register(r"products", ProductViewSet)
 router.register(r"reviews", ReviewViewSet)
 router.register(r"my-reviews", UserReviewViewSet, basename="my-review")
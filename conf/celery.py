@@ -19,12 +19,20 @@ def debug_task(self):
 
 # Расписание
 app.conf.beat_schedule = {
-    "send-appointment-reminders-every-day-8am": {
+    "send-appointment-reminders-every-5-minutes": {
         "task": "beauty_salon.tasks.send_appointment_reminders",
-        "schedule": crontab(hour=8, minute=0),
+        "schedule": crontab(minute="*/5"),
     },
     "delete-old-appointments-monthly": {
         "task": "beauty_salon.tasks.delete_old_appointments",
         "schedule": crontab(day_of_month=1, hour=0, minute=0),
     },
+    "trim-appointment-history-weekly": {
+        "task": "beauty_salon.tasks.trim_appointment_history",
+        "schedule": crontab(day_of_week=0, hour=3, minute=0),
+    },
+    "release-expired-slot-holds-every-minute": {
+        "task": "beauty_salon.tasks.release_expired_slot_holds",
+        "schedule": crontab(),
+    },
 }
@@ -1,8 +1,9 @@
 import os
-from datetime import timedelta
+from datetime import time, timedelta
 from pathlib import Path
 
 # from django.conf.global_settings import MEDIA_URL
+from corsheaders.defaults import default_headers as default_cors_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -51,6 +52,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:8080",
     "http://localhost:5173",
 ]
+# Условные GET-запросы (ETag / Last-Modified) из SPA и мобильных клиентов
+CORS_ALLOW_HEADERS = (*default_cors_headers, "if-none-match", "if-modified-since")
+CORS_EXPOSE_HEADERS = ["ETag", "Last-Modified"]
 
 ROOT_URLCONF = "conf.urls"
 
@@ -80,6 +84,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Тестовая БД — файл, а не память: с общей in-memory базой потоки
+        # получают "table is locked" вместо ожидания, как в рабочей БД
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
@@ -144,6 +151,32 @@ DEFAULT_FROM_EMAIL = os.getenv(
     "DEFAULT_FROM_EMAIL", "Bellezza Salon bellezza@example.com"
 )
 
+# Рабочий день салона и сетка записи
+SALON_OPENING_TIME = time(9, 0)
+SALON_CLOSING_TIME = time(21, 0)
+APPOINTMENT_SLOT_MINUTES = 30
+# Максимальный период одного запроса свободных слотов, дней
+AVAILABILITY_MAX_DAYS = 14
+# Сколько секунд бронирование ждёт очереди к расписанию мастера
+BOOKING_LOCK_WAIT = 3
+# Сколько секунд держится временная бронь слота до подтверждения
+SLOT_HOLD_TIMEOUT = 60 * 5
+# Сколько записей обрабатывает одна задача рассылки напоминаний
+REMINDER_BATCH_SIZE = 100
+# Через сколько секунд строка журнала, захваченная на отправку и не
+# завершённая (воркер упал), возвращается в очередь
+REMINDER_SENDING_LEASE = 60 * 15
+# Очистка старых записей: срок хранения, размер пачки, пауза между пачками
+# (секунды) и каталог для архива удаляемого (пусто — без архива)
+APPOINTMENT_RETENTION_DAYS = 365
+PURGE_BATCH_SIZE = 1000
+PURGE_BATCH_PAUSE = 0.1
+PURGE_ARCHIVE_DIR = os.getenv("PURGE_ARCHIVE_DIR", "")
+# История записей: старше стольких дней хранятся только смены статуса,
+# старше HISTORY_RETENTION_DAYS — удаляется
+HISTORY_COMPACT_DAYS = 90
+HISTORY_RETENTION_DAYS = 365 * 2
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -192,6 +225,15 @@ SESSION_CACHE_ALIAS = "default"
 # Время жизни кеша по умолчанию (15 минут)
 CACHE_TTL = 60 * 15
 
+# Каталог (категории, услуги, мастера, продукты) инвалидируется сигналами,
+# поэтому его можно держать в кеше долго
+CATALOG_CACHE_TTL = 60 * 60 * 24 * 3
+
+# L1-кеш каталога в памяти процесса поверх Redis: размер и TTL в секундах.
+# Согласованность поддерживается через Redis pub/sub.
+LOCAL_CACHE_MAX_ENTRIES = 256
+LOCAL_CACHE_TIMEOUT = 60
+
 # сериализация
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
@@ -9,6 +9,7 @@ from rest_framework import permissions
 from rest_framework_simplejwt.views import TokenRefreshView
 
 from beauty_salon.views import (
+    AvailabilityView,
     CurrentUserView,
     EmailTokenObtainPairView,
     RegisterAPIView,
@@ -42,6 +43,7 @@ urlpatterns = [
     path("api/v1/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/v1/auth/register/", RegisterAPIView.as_view(), name="api_register"),
     path("api/v1/users/me/", CurrentUserView.as_view(), name="api_current_user"),
+    path("api/v1/availability/", AvailabilityView.as_view(), name="api_availability"),
     # Swagger URLs
     re_path(
         r"^swagger(?P<format>\.json|\.yaml)$",